@@ -0,0 +1,268 @@
+"""Local stand-in for the Instagram private API, serving canned responses.
+
+Only the endpoints the MCP tools use are implemented; anything else (including
+every public web/GraphQL endpoint, so instagrapi falls back to the private
+API) answers 404. ``FakeInstagramAdapter`` redirects a requests Session to the
+server whatever host instagrapi asks for.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+from requests.adapters import HTTPAdapter
+
+VIEWER_ID = 1000
+# 1x1 white JPEG, enough for instagrapi to write a file
+JPEG = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f141d1a1f1e1d1a1c1c20242e2720"
+    "222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001000101011100ffc4001f0000010501010101010100000000000000000102030405"
+    "060708090a0bffc400b5100002010303020403050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282090a"
+    "161718191a25262728292a3435363738393a434445464748494a535455565758595a636465666768696a737475767778797a838485868788898a92939495969798"
+    "999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100"
+    "003f00fbfcffd9"
+)
+
+
+def _user(pk: int) -> Dict[str, Any]:
+    return {
+        "pk": str(pk),
+        "id": str(pk),
+        "username": f"user{pk}",
+        "full_name": f"User {pk}",
+        "is_private": False,
+        "is_verified": False,
+        "profile_pic_url": f"https://cdn.example/profile/{pk}.jpg",
+    }
+
+
+class FakeInstagram:
+    """Canned inbox of ``threads`` threads with ``messages`` messages each.
+
+    Every fifth message is a photo whose URL points back at the server.
+    ``latency`` adds a fixed delay to every response to mimic the network.
+    """
+
+    def __init__(self, threads: int = 20, messages: int = 200, latency: float = 0.0):
+        self.thread_count = threads
+        self.message_count = messages
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._next_item_id = 10 ** 12
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.base_url = ""
+
+    # -- canned data ---------------------------------------------------------
+
+    def thread_id(self, index: int) -> str:
+        return str(340282366841710300949128100000000000 + index)
+
+    def _item(self, thread_index: int, n: int) -> Dict[str, Any]:
+        """Message ``n`` of a thread; n == 0 is the oldest."""
+        sender = VIEWER_ID if n % 2 else 2000 + thread_index
+        item = {
+            "item_id": str(10 ** 11 + thread_index * 10 ** 6 + n),
+            "user_id": sender,
+            "timestamp": str((1_700_000_000 + n * 60) * 1_000_000),
+            "item_type": "text",
+            "text": f"message {n} in thread {thread_index} about lunch plans",
+            "client_context": str(n),
+        }
+        if n % 5 == 4:
+            media_id = f"{thread_index}_{n}"
+            item.pop("text")
+            item["item_type"] = "media"
+            item["media"] = {
+                "id": media_id,
+                "media_type": 1,
+                "image_versions2": {"candidates": [{"width": 1, "height": 1, "url": f"{self.base_url}/media/{media_id}.jpg"}]},
+            }
+        return item
+
+    def _thread(self, index: int, items: List[Dict[str, Any]], has_older: bool, oldest_cursor: Optional[str]) -> Dict[str, Any]:
+        newest = self.message_count - 1
+        return {
+            "thread_id": self.thread_id(index),
+            "thread_v2_id": str(17840000000000000 + index),
+            "thread_title": f"user{2000 + index}",
+            "users": [_user(2000 + index)],
+            "admin_user_ids": [],
+            "items": items,
+            "last_activity_at": (1_700_000_000 + newest * 60) * 1_000_000,
+            "muted": False,
+            "is_pin": False,
+            "named": False,
+            "canonical": True,
+            "pending": False,
+            "archived": False,
+            "thread_type": "private",
+            "folder": 0,
+            "vc_muted": False,
+            "is_group": False,
+            "mentions_muted": False,
+            "approval_required_for_new_members": False,
+            "input_mode": 0,
+            "business_thread_folder": 0,
+            "read_state": 0,
+            "is_close_friend_thread": False,
+            "assigned_admin_id": 0,
+            "shh_mode_enabled": False,
+            "last_seen_at": {},
+            "has_older": has_older,
+            "oldest_cursor": oldest_cursor,
+        }
+
+    def _thread_index(self, thread_id: str) -> Optional[int]:
+        index = int(thread_id) - int(self.thread_id(0))
+        return index if 0 <= index < self.thread_count else None
+
+    def _thread_page(self, index: int, cursor: Optional[str], limit: int) -> Dict[str, Any]:
+        end = int(cursor) if cursor else self.message_count
+        start = max(0, end - limit)
+        items = [self._item(index, n) for n in range(end - 1, start - 1, -1)]
+        return self._thread(index, items, start > 0, str(start) if start > 0 else None)
+
+    # -- routing ---------------------------------------------------------------
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: bytes) -> Tuple[int, str, bytes]:
+        if path.startswith("/media/"):
+            return 200, "image/jpeg", JPEG
+
+        def arg(name: str, default: Any = None) -> Any:
+            return query.get(name, [default])[0]
+
+        if method == "POST" and re.fullmatch(r"/rupload_ig(photo|video)/\w+", path):
+            return self._json({"upload_id": path.rsplit("/", 1)[1].split("_")[0], "status": "ok"})
+        if method == "GET" and path == "/api/v1/direct_v2/inbox/":
+            limit = int(arg("thread_message_limit", 10))
+            threads = [self._thread_page(i, None, limit) for i in range(self.thread_count)]
+            return self._json({"inbox": {"threads": threads, "oldest_cursor": None, "has_older": False}})
+        match = re.fullmatch(r"/api/v1/direct_v2/threads/(\d+)/", path)
+        if method == "GET" and match:
+            index = self._thread_index(match.group(1))
+            if index is None:
+                return self._json({"status": "fail", "message": "Thread not found"}, 404)
+            return self._json({"thread": self._thread_page(index, arg("cursor"), int(arg("limit", 20)))})
+        if method == "GET" and path == "/api/v1/direct_v2/threads/get_by_participants/":
+            users = json.loads(arg("recipient_users", "[]"))
+            index = (int(users[0]) - 2000) % self.thread_count if len(users) == 1 else None
+            if index is None:
+                return self._json({"users": [], "status": "ok"})
+            return self._json({"thread": self._thread_page(index, None, int(arg("limit", 20))), "users": [_user(2000 + index)], "status": "ok"})
+        if method == "POST" and re.fullmatch(r"/api/v1/direct_v2/threads/broadcast/\w+/", path):
+            form = parse_qs(body.decode())
+            # One message per conversation: each recipient_users list, or each thread id
+            recipients = json.loads(form.get("recipient_users", ["[]"])[0])
+            thread_ids = json.loads(form.get("thread_ids", ["[]"])[0])
+            conversations = [self.thread_id(int(users[0]) % self.thread_count) for users in recipients if users]
+            conversations += [str(tid) for tid in thread_ids]
+            items = []
+            for conversation in conversations or [self.thread_id(0)]:
+                with self._lock:
+                    self._next_item_id += 1
+                    item_id = self._next_item_id
+                items.append({
+                    "item_id": str(item_id),
+                    "thread_id": conversation,
+                    "timestamp": str(int(time.time() * 1_000_000)),
+                    "client_context": form.get("client_context", [""])[0],
+                    "user_id": VIEWER_ID,
+                    "item_type": "text",
+                    "text": form.get("text", [""])[0],
+                })
+            response = {"action": "item_ack", "status_code": "200", "payload": items[0], "status": "ok"}
+            if len(items) > 1:
+                response["message_metadata"] = items
+            return self._json(response)
+        if method == "POST" and path == "/api/v1/direct_v2/fetch_and_subscribe_presence/":
+            user_ids = json.loads(parse_qs(body.decode()).get("request_data", ["[]"])[0])
+            presence = {str(uid): {"is_active": uid % 2 == 0, "last_activity_at_ms": str(int(time.time() * 1000))} for uid in user_ids}
+            return self._json({"user_presence": presence, "status": "ok"})
+        match = re.fullmatch(r"/api/v1/users/(\w+)/usernameinfo/", path)
+        if method == "GET" and match:
+            pk = int(re.sub(r"\D", "", match.group(1)) or 3000)
+            return self._json({"user": self._full_user(pk), "status": "ok"})
+        match = re.fullmatch(r"/api/v1/users/(\d+)/info/", path)
+        if method == "GET" and match:
+            return self._json({"user": self._full_user(int(match.group(1))), "status": "ok"})
+        return self._json({"status": "fail", "message": "Not found"}, 404)
+
+    def _full_user(self, pk: int) -> Dict[str, Any]:
+        user = _user(pk)
+        user.update({
+            "media_count": 10,
+            "follower_count": 100,
+            "following_count": 50,
+            "biography": "benchmark user",
+            "external_url": "",
+            "is_business": False,
+            "pinned_channels_info": {"pinned_channels_list": []},
+        })
+        return user
+
+    @staticmethod
+    def _json(data: Any, status: int = 200) -> Tuple[int, str, bytes]:
+        return status, "application/json", json.dumps(data).encode()
+
+    # -- server ----------------------------------------------------------------
+
+    def start(self) -> "FakeInstagram":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self, method: str) -> None:
+                url = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, content_type, payload = fake.handle(method, url.path, parse_qs(url.query), body)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake._lock:
+                    fake.requests += 1
+                    fake.bytes_sent += len(payload)
+                    fake.bytes_received += len(body)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class FakeInstagramAdapter(HTTPAdapter):
+    """Sends every request to the fake server, keeping its path and query."""
+
+    def __init__(self, base_url: str):
+        super().__init__(pool_maxsize=64)
+        self.base = urlsplit(base_url)
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        request.url = urlunsplit((self.base.scheme, self.base.netloc, url.path, url.query, ""))
+        return super().send(request, **kwargs)
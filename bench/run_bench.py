@@ -0,0 +1,246 @@
+"""Offline benchmark for the MCP tools against a local fake Instagram API.
+
+Each tool is called through FastMCP's ``call_tool`` (argument validation and
+result serialization included) at the requested concurrency, and the run
+reports p50/p95/p99 latency, calls per second, peak traced memory and the
+upstream requests and uploaded bytes each tool caused. Results are written as
+JSON so two runs can be compared with ``--compare``.
+
+    uv run bench/run_bench.py --requests 200 --concurrency 8
+    uv run bench/run_bench.py --compare bench/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+from fake_instagram import VIEWER_ID, FakeInstagram, FakeInstagramAdapter  # noqa: E402
+
+BENCH_USERNAME = "bench_viewer"
+DEFAULT_TOOLS = [
+    "list_chats",
+    "list_messages",
+    "get_thread_details",
+    "get_thread_by_participants",
+    "search_messages",
+    "send_message",
+    "send_messages_bulk",
+    "send_photo_message",
+    "send_photo_to_many",
+    "get_user_info",
+    "check_user_online_status",
+    "download_media_from_message",
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def build_server(fake: FakeInstagram, request_timeout: float):
+    """Import the MCP server with an account whose clients talk to ``fake``."""
+    import mcp_server
+    from instagrapi import Client
+
+    class BenchClient(Client):
+        def __init__(self, *args, **kwargs):
+            kwargs.setdefault("settings", {"authorization_data": {"ds_user_id": str(VIEWER_ID), "sessionid": f"{VIEWER_ID}%3Abench"}})
+            super().__init__(*args, **kwargs)
+            # instagrapi sleeps request_timeout seconds before every request
+            self.request_timeout = request_timeout
+            adapter = FakeInstagramAdapter(fake.base_url)
+            for session in (self.private, self.public):
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+
+        # request_timeout doubles as the media download timeout, where 0 is
+        # invalid; each worker thread has its own client, so swapping it is safe
+        def _download(self, download, *args, **kwargs):
+            self.request_timeout, sleep = 30, self.request_timeout
+            try:
+                return download(*args, **kwargs)
+            finally:
+                self.request_timeout = sleep
+
+        def photo_download_by_url(self, *args, **kwargs):
+            return self._download(super().photo_download_by_url, *args, **kwargs)
+
+        def video_download_by_url(self, *args, **kwargs):
+            return self._download(super().video_download_by_url, *args, **kwargs)
+
+    account = mcp_server._add_account(BENCH_USERNAME, "unused")
+    account.client_factory = BenchClient
+    account.session_file = Path(os.environ["INSTAGRAM_DATA_DIR"]) / "bench_session.json"
+    return mcp_server
+
+
+def camera_photo(path: Path) -> Path:
+    """A 12 MP JPEG with EXIF data, like a phone camera original."""
+    from PIL import Image
+
+    size = (4032, 3024)
+    detail = Image.effect_mandelbrot(size, (-2.0, -1.1, 0.9, 1.1), 64)
+    gradient = Image.linear_gradient("L").resize(size)
+    image = Image.merge("RGB", (detail, gradient, Image.effect_noise(size, 12)))
+    exif = Image.Exif()
+    exif[0x0110] = "Bench Camera"  # Model
+    exif[0x0112] = 6  # Orientation: rotated 90 degrees
+    image.save(path, "JPEG", quality=92, exif=exif)
+    return path
+
+
+def scenarios(fake: FakeInstagram, data_dir: Path) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    """Tool name -> function building the arguments of call ``i``."""
+    download_root = data_dir / "downloads"
+    photo = camera_photo(data_dir / "camera.jpg")
+    thread = lambda i: fake.thread_id(i % fake.thread_count)  # noqa: E731
+    # Every fifth message is a photo; cycle over the four newest ones of thread 0
+    newest_photo = (fake.message_count - 5) // 5 * 5 + 4
+    return {
+        "list_chats": lambda i: {"amount": 20},
+        "list_messages": lambda i: {"thread_id": thread(i), "amount": 20},
+        "get_thread_details": lambda i: {"thread_id": thread(i), "amount": 20},
+        "get_thread_by_participants": lambda i: {"user_ids": [2000 + i % fake.thread_count]},
+        "search_messages": lambda i: {"query": "lunch", "limit": 20},
+        "send_message": lambda i: {"username": f"user{2000 + i % fake.thread_count}", "message": f"bench message {i}"},
+        "send_messages_bulk": lambda i: {
+            "recipients": [{"username": f"user{2000 + (i + k) % 60}", "n": str(k)} for k in range(20)],
+            "template": "bench message {n} to {username}",
+        },
+        "send_photo_message": lambda i: {"username": f"user{2000 + i % fake.thread_count}", "photo_path": str(photo)},
+        "send_photo_to_many": lambda i: {"photo_path": str(photo), "usernames": [f"user{2000 + (i + k) % 60}" for k in range(20)]},
+        "get_user_info": lambda i: {"username": f"user{3000 + i}"},
+        "check_user_online_status": lambda i: {"usernames": [f"user{2000 + (i + k) % 60}" for k in range(10)]},
+        "download_media_from_message": lambda i: {
+            "thread_id": fake.thread_id(0),
+            "message_id": str(10 ** 11 + newest_photo - 5 * (i % 4)),
+            "download_path": str(download_root / f"run{i}"),
+        },
+    }
+
+
+async def run_tool(mcp_server, name: str, make_args: Callable[[int], Dict[str, Any]], requests: int, concurrency: int, fake: FakeInstagram) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                content = await mcp_server.mcp.call_tool(name, make_args(i))
+                result = json.loads(content[0].text)
+                if not result.get("success", True):
+                    errors[result.get("message", "failed")[:80]] = errors.get(result.get("message", "failed")[:80], 0) + 1
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.append(time.perf_counter() - started)
+
+    upstream_before, uploaded_before = fake.requests, fake.bytes_received
+    tracemalloc.reset_peak()
+    base_memory, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    _, peak_memory = tracemalloc.get_traced_memory()
+    latencies.sort()
+    return {
+        "calls": requests,
+        "errors": sum(errors.values()),
+        "error_messages": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "calls_per_second": round(requests / elapsed, 1) if elapsed else 0.0,
+        "peak_memory_kb": round(max(0, peak_memory - base_memory) / 1024, 1),
+        "upstream_requests": fake.requests - upstream_before,
+        "uploaded_kb": round((fake.bytes_received - uploaded_before) / 1024, 1),
+    }
+
+
+def print_table(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> None:
+    header = f"{'tool':<30} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls/s':>9} {'peak KB':>9} {'upstream':>9} {'sent KB':>9} {'errors':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        line = f"{name:<30} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['calls_per_second']:>9.1f} {r['peak_memory_kb']:>9.1f} {r['upstream_requests']:>9} {r.get('uploaded_kb', 0):>9.1f} {r['errors']:>7}"
+        old = baseline.get(name)
+        if old:
+            change = lambda key: (r[key] - old[key]) / old[key] * 100 if old[key] else 0.0  # noqa: E731
+            line += f"   p50 {change('p50_ms'):+.0f}%  p95 {change('p95_ms'):+.0f}%  calls/s {change('calls_per_second'):+.0f}%"
+        print(line)
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeInstagram(threads=args.threads, messages=args.messages, latency=args.latency / 1000).start()
+    try:
+        mcp_server = build_server(fake, args.request_timeout)
+        builders = scenarios(fake, Path(os.environ["INSTAGRAM_DATA_DIR"]))
+        unknown = [name for name in args.tools if name not in builders]
+        if unknown:
+            raise SystemExit(f"Unknown tools: {', '.join(unknown)}. Available: {', '.join(builders)}")
+        tracemalloc.start()
+        results = {}
+        for name in args.tools:
+            for i in range(args.warmup):
+                await mcp_server.mcp.call_tool(name, builders[name](i))
+            results[name] = await run_tool(mcp_server, name, builders[name], args.requests, args.concurrency, fake)
+        tracemalloc.stop()
+        return results
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tools", nargs="+", default=DEFAULT_TOOLS, help="Tools to benchmark (default: all scenarios)")
+    parser.add_argument("--requests", type=int, default=100, help="Calls per tool (default 100)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls in flight at once (default 8)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed calls per tool before measuring (default 1)")
+    parser.add_argument("--threads", type=int, default=20, help="Threads in the fake inbox (default 20)")
+    parser.add_argument("--messages", type=int, default=200, help="Messages per fake thread (default 200)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated network latency per upstream request in ms (default 0)")
+    parser.add_argument("--request-timeout", type=float, default=0.0, help="instagrapi's sleep before every request in seconds (default 0; instagrapi itself uses 1)")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Keep the server's upstream rate limits instead of lifting them")
+    parser.add_argument("--output", type=Path, help="Where to save the results (default bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    # Configure the server before it is imported
+    data_dir = tempfile.mkdtemp(prefix="instagram_dm_mcp_bench_")
+    os.environ["INSTAGRAM_DATA_DIR"] = data_dir
+    if not args.keep_rate_limits:
+        for endpoint_class in ("READ", "SEND", "UPLOAD", "SEARCH"):
+            os.environ[f"INSTAGRAM_RATE_LIMIT_{endpoint_class}"] = "1000000,100000"
+    os.environ.setdefault("INSTAGRAM_MAX_WORKERS", str(max(4, args.concurrency)))
+
+    results = asyncio.run(main(args))
+    baseline = json.loads(args.compare.read_text())["results"] if args.compare else {}
+    print_table(results, baseline)
+
+    output = args.output or BENCH_DIR / "results" / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    run_config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    output.write_text(json.dumps({
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": run_config,
+        "results": results,
+    }, indent=2))
+    print(f"\nSaved results to {output}")
@@ -0,0 +1,136 @@
+"""Micro-benchmark for the list_messages / list_chats serializers.
+
+Builds threads of 1k and 10k ``DirectMessage`` models with a realistic mix of
+item types (text, photos, shared posts and reels, XMA shares) and compares
+the per-message cost of the previous ``model_dump``-and-probe path with
+``serializers.serialize_message``, both on its own and including the
+``pydantic_core.to_json`` encoding FastMCP applies to tool results.
+
+    uv run bench/serializer_bench.py
+    uv run bench/serializer_bench.py --sizes 1000 5000 10000 --repeat 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from instagrapi.extractors import extract_direct_message  # noqa: E402
+from pydantic_core import to_json  # noqa: E402
+
+from serializers import serialize_message  # noqa: E402
+
+THREAD_ID = 340282366841710300949128100000000001
+
+
+def _shared_media(n: int) -> Dict[str, Any]:
+    return {
+        "pk": str(3100000000000000000 + n),
+        "id": f"{3100000000000000000 + n}_42",
+        "code": f"C{n:010d}",
+        "taken_at": 1_700_000_000 + n,
+        "media_type": 2,
+        "product_type": "clips" if n % 2 else "feed",
+        "user": {"pk": "42", "username": "creator", "full_name": "Creator", "profile_pic_url": "https://cdn.example/p.jpg"},
+        "image_versions2": {"candidates": [{"width": 1080, "height": 1920, "url": f"https://cdn.example/t/{n}.jpg"}]},
+        "video_versions": [{"width": 1080, "height": 1920, "url": f"https://cdn.example/v/{n}.mp4", "type": 101}],
+        "caption": {"text": f"caption for shared post {n} #lunch #plans"},
+        "like_count": 1000 + n,
+        "comment_count": 12,
+        "usertags": {"in": []},
+        "video_duration": 12.5,
+    }
+
+
+def _item(n: int) -> Dict[str, Any]:
+    """Message ``n``: mostly text, with photos, shared posts, reels and XMA shares mixed in."""
+    item = {
+        "item_id": str(10 ** 11 + n),
+        "user_id": 2000 if n % 2 else 1000,
+        "thread_id": THREAD_ID,
+        "timestamp": str((1_700_000_000 + n * 60) * 1_000_000),
+        "item_type": "text",
+        "text": f"message {n} about lunch plans",
+        "client_context": str(n),
+    }
+    kind = n % 10
+    if kind in (3, 8):
+        item.pop("text")
+        item["item_type"] = "media"
+        item["media"] = {
+            "id": str(n),
+            "media_type": 1,
+            "image_versions2": {"candidates": [{"width": 1080, "height": 1350, "url": f"https://cdn.example/m/{n}.jpg"}]},
+        }
+    elif kind == 5:
+        item["item_type"] = "media_share"
+        item["media_share"] = _shared_media(n)
+    elif kind == 6:
+        item["item_type"] = "clip"
+        item["clip"] = {"clip": _shared_media(n)}
+    elif kind == 9:
+        item["item_type"] = "xma_media_share"
+        item["xma_media_share"] = [{
+            "target_url": f"https://www.instagram.com/p/C{n:010d}/?igsh=abc",
+            "title_text": "shared post",
+            "preview_url": f"https://cdn.example/x/{n}.jpg",
+            "header_icon_url": "https://cdn.example/icon.jpg",
+            "header_title_text": "creator",
+        }]
+    return item
+
+
+def previous(messages: List[Any]) -> List[Dict[str, Any]]:
+    """``list_messages`` before the serializers: dump each message, then probe the dump for shared posts."""
+    result = []
+    for m in messages:
+        msg = m.model_dump()
+        item_type = m.item_type
+        shared_info = shared_url = shared_code = None
+        if item_type in ["clip", "media_share", "reel_share", "xma_media_share", "post_share"]:
+            for obj in [msg.get("clip"), msg.get("media_share"), msg.get("xma_media_share"), msg.get("post_share")]:
+                if obj:
+                    shared_code = obj.get("code") or obj.get("pk")
+                    shared_url = obj.get("url") or (f"https://www.instagram.com/reel/{shared_code}/" if shared_code else None)
+                    shared_info = obj
+                    break
+        msg["shared_post_info"] = shared_info
+        msg["shared_post_url"] = shared_url
+        msg["shared_post_code"] = shared_code
+        result.append(msg)
+    return result
+
+
+def current(messages: List[Any]) -> List[Dict[str, Any]]:
+    return [serialize_message(m) for m in messages]
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-message cost of the list_messages serializer.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Messages per thread")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'messages':>9} {'path':<9} {'build µs/msg':>13} {'+json µs/msg':>13} {'json KB':>9}")
+    for size in args.sizes:
+        messages = [extract_direct_message(_item(n)) for n in range(size)]
+        for name, serialize in (("previous", previous), ("current", current)):
+            build = _best(lambda: serialize(messages), args.repeat)
+            encoded = _best(lambda: to_json(serialize(messages), fallback=str, indent=2), args.repeat)
+            kilobytes = len(to_json(serialize(messages), fallback=str, indent=2)) / 1024
+            print(f"{size:>9} {name:<9} {build / size * 1e6:>13.1f} {encoded / size * 1e6:>13.1f} {kilobytes:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
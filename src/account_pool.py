@@ -0,0 +1,118 @@
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from rate_limiter import RateLimiter
+from worker_pool import ClientWorkerPool
+
+
+class Account:
+    """One Instagram account with its own session file, workers and rate limits.
+
+    Nothing touches instagrapi until first use: ``prepare()`` builds the Client
+    from ``client_factory`` and loads ``{username}_session.json``, and
+    ``ensure_logged_in()`` only logs in when that session has no user yet.
+    An expired session is refreshed with ``relogin()``.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: Optional[str],
+        client_factory: Callable[[], Any],
+        rate_limiter: RateLimiter,
+        max_workers: int = 4,
+        response_hook: Optional[Callable] = None,
+    ):
+        self.username = username
+        self.password = password
+        self.client_factory = client_factory
+        self.client = None
+        self.rate_limiter = rate_limiter
+        # The pool gets its Client in prepare(); workers clone it on first call
+        self.worker_pool = ClientWorkerPool(None, max_workers=max_workers, response_hook=response_hook)
+        self.session_file = Path(f"{username}_session.json")
+        self.logged_in = False
+        self._setup_lock = threading.Lock()
+
+    def prepare(self) -> None:
+        """Create the Client and load the saved session, if there is one."""
+        with self._setup_lock:
+            if self.client is not None:
+                return
+            client = self.client_factory()
+            if self.session_file.exists():
+                client.load_settings(self.session_file)
+            self.client = self.worker_pool.client = client
+
+    def ensure_logged_in(self) -> None:
+        """Log in unless the loaded session already identifies the account."""
+        if self.logged_in:
+            return
+        self.prepare()
+        with self._setup_lock:
+            if self.logged_in:
+                return
+            with self.worker_pool.lock:
+                if not self.client.user_id:
+                    self.client.login(self.username, self.password)
+                    self.client.dump_settings(self.session_file)
+            self.worker_pool.invalidate()
+            self.logged_in = True
+
+    def relogin(self, seen_generation: Optional[int] = None) -> None:
+        """Replace an expired session with a fresh login and save it.
+
+        Args:
+            seen_generation: ``worker_pool.generation`` when the failed call
+                started. If the session has been replaced since (another call
+                saw it expire at the same time), nothing is done.
+        """
+        self.prepare()
+        with self._setup_lock:
+            if seen_generation is not None and self.worker_pool.generation != seen_generation:
+                return
+            with self.worker_pool.lock:
+                self.client.login(self.username, self.password, relogin=True)
+                self.client.dump_settings(self.session_file)
+            self.worker_pool.invalidate()
+            self.logged_in = True
+
+
+class AccountPool:
+    """The accounts this server can act as; the first one added is the default."""
+
+    def __init__(self):
+        self._accounts: Dict[str, Account] = {}
+
+    def add(self, account: Account) -> Account:
+        self._accounts[account.username.lower()] = account
+        return account
+
+    def remove(self, username: str) -> None:
+        account = self._accounts.pop(username.lstrip("@").lower(), None)
+        if account is not None:
+            account.worker_pool.shutdown(wait=False)
+
+    def get(self, username: Optional[str] = None) -> Account:
+        """Return the named account, or the default one when ``username`` is None."""
+        if not self._accounts:
+            raise RuntimeError("No Instagram account is logged in.")
+        if username is None:
+            return next(iter(self._accounts.values()))
+        account = self._accounts.get(username.lstrip("@").lower())
+        if account is None:
+            raise ValueError(f"Account '{username}' is not logged in on this server.")
+        return account
+
+    def pick_for_read(self, endpoint_class: str) -> Account:
+        """The account with the most spare rate limit for ``endpoint_class``."""
+        if not self._accounts:
+            raise RuntimeError("No Instagram account is logged in.")
+        return max(self._accounts.values(), key=lambda a: a.rate_limiter.available(endpoint_class))
+
+    def __iter__(self) -> Iterator[Account]:
+        return iter(list(self._accounts.values()))
+
+    def __len__(self) -> int:
+        return len(self._accounts)
@@ -0,0 +1,130 @@
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+NAV_CHAIN = (
+    "1qT:feed_timeline:1,7Az:direct_inbox:2,7Az:direct_inbox:3,"
+    "5rG:direct_thread:4,6xQ:direct_media_picker_photos_fragment:5,"
+    "5rG:direct_thread:6,5rG:direct_thread:7,"
+    "6xQ:direct_media_picker_photos_fragment:8,5rG:direct_thread:9"
+)
+
+
+def rupload_photo(client, path: Path) -> Tuple[str, int, int]:
+    """Upload a JPEG that is already within Instagram's limits, byte for byte.
+
+    ``Client.photo_rupload`` decodes, crops, scales and re-encodes every
+    photo before uploading it; files made by ``photo_prep.prepare_photo``
+    need none of that.
+
+    Returns:
+        ``(upload_id, width, height)`` like ``Client.photo_rupload``.
+    """
+    from instagrapi import config
+    from instagrapi.exceptions import PhotoNotUpload
+    from PIL import Image
+
+    data = Path(path).read_bytes()
+    upload_id = str(int(time.time() * 1000))
+    upload_name = f"{upload_id}_0_{random.randint(1000000000, 9999999999)}"
+    rupload_params = {
+        "retry_context": '{"num_step_auto_retry":0,"num_reupload":0,"num_step_manual_retry":0}',
+        "media_type": "1",
+        "xsharing_user_ids": "[]",
+        "upload_id": upload_id,
+        "image_compression": json.dumps({"lib_name": "moz", "lib_version": "3.1.m", "quality": "80"}),
+    }
+    headers = {
+        "Accept-Encoding": "gzip",
+        "X-Instagram-Rupload-Params": json.dumps(rupload_params),
+        "X_FB_PHOTO_WATERFALL_ID": str(uuid4()),
+        "X-Entity-Type": "image/jpeg",
+        "Offset": "0",
+        "X-Entity-Name": upload_name,
+        "X-Entity-Length": str(len(data)),
+        "Content-Type": "application/octet-stream",
+        "Content-Length": str(len(data)),
+    }
+    response = client.private.post(f"https://{config.API_DOMAIN}/rupload_igphoto/{upload_name}", data=data, headers=headers)
+    client.request_log(response)
+    if response.status_code != 200:
+        raise PhotoNotUpload(response.text, response=response, **client.last_json)
+    with Image.open(path) as image:
+        width, height = image.size
+    return upload_id, width, height
+
+
+def configure_direct_media(
+    client,
+    kind: str,
+    upload_id: str,
+    recipients: Optional[List[List[str]]] = None,
+    thread_ids: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Post an uploaded photo or video to conversations, like the configure step of ``Client.direct_send_file``.
+
+    One upload can be posted to many conversations in a single request.
+
+    Args:
+        kind: "photo" or "video".
+        upload_id: Upload id from ``rupload_photo``, ``Client.photo_rupload`` or ``Client.video_rupload``.
+        recipients: User id lists, each one conversation (``[[a], [b]]`` messages
+            a and b separately, ``[[a, b]]`` sends to a group with both).
+        thread_ids: Existing threads to post to instead.
+    Returns:
+        The raw response; see ``sent_items``.
+    """
+    assert (recipients or thread_ids) and not (recipients and thread_ids), "Specify recipients or thread_ids, but not both"
+    token = client.generate_mutation_token()
+    data = {
+        "action": "send_item",
+        "is_shh_mode": "0",
+        "send_attribution": "direct_thread",
+        "client_context": token,
+        "mutation_token": token,
+        "nav_chain": NAV_CHAIN,
+        "offline_threading_id": token,
+        "upload_id": upload_id,
+    }
+    if kind == "video":
+        data["video_result"] = ""
+    else:
+        data["send_attribution"] = "inbox"
+        data["allow_full_aspect_ratio"] = "true"
+    if recipients:
+        data["recipient_users"] = json.dumps([[int(uid) for uid in users] for users in recipients])
+    if thread_ids:
+        data["thread_ids"] = json.dumps([int(tid) for tid in thread_ids])
+    return client.private_request(
+        f"direct_v2/threads/broadcast/configure_{kind}/",
+        data=client.with_default_data(data),
+        with_signature=False,
+    )
+
+
+def sent_items(result: Dict[str, Any]) -> List[Dict[str, Optional[str]]]:
+    """``{"thread_id", "item_id"}`` of each message a configure call created, in request order.
+
+    Instagram lists them in ``message_metadata`` when one call posts to
+    several conversations and only returns ``payload`` otherwise.
+    """
+    items = result.get("message_metadata") or [result.get("payload") or {}]
+    return [
+        {
+            "thread_id": str(item["thread_id"]) if item.get("thread_id") else None,
+            "item_id": str(item["item_id"]) if item.get("item_id") else None,
+        }
+        for item in items
+    ]
+
+
+def direct_send_prepared_photo(client, path: Path, user_ids: List[str]):
+    """``Client.direct_send_photo`` for a photo made by ``photo_prep.prepare_photo``."""
+    from instagrapi.extractors import extract_direct_message
+
+    upload_id, _, _ = rupload_photo(client, path)
+    result = configure_direct_media(client, "photo", upload_id, recipients=[user_ids])
+    return extract_direct_message(result["payload"])
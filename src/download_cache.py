@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class DownloadCache:
+    """Content-addressed cache of downloaded media.
+
+    Files are stored once per content hash under ``root/objects`` and
+    ``root/index.json`` maps a media key (e.g. ``media:<pk>``) to the files it
+    produced. Lookups hard-link (or copy) the cached objects into the requested
+    download directory, so a hit needs no network I/O. When the objects exceed
+    ``max_bytes`` the least recently used keys are evicted.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self._lock = threading.Lock()
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if self.index_path.exists():
+            try:
+                self._entries = json.loads(self.index_path.read_text()).get("entries", {})
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def _object_path(self, sha256: str, name: str) -> Path:
+        return self.objects_dir / sha256[:2] / (sha256 + Path(name).suffix)
+
+    def _save(self) -> None:
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"entries": self._entries}))
+        os.replace(tmp, self.index_path)
+
+    def _evict(self) -> None:
+        sizes: Dict[str, int] = {}
+        for entry in self._entries.values():
+            for f in entry["files"]:
+                sizes[f["sha256"]] = f["size"]
+        total = sum(sizes.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries.pop(key)
+            still_used = {f["sha256"] for e in self._entries.values() for f in e["files"]}
+            for f in entry["files"]:
+                if f["sha256"] in still_used or f["sha256"] not in sizes:
+                    continue
+                self._object_path(f["sha256"], f["name"]).unlink(missing_ok=True)
+                total -= sizes.pop(f["sha256"])
+
+    def get(self, key: str, download_path: str) -> Optional[Dict[str, Any]]:
+        """Place the cached files for ``key`` in ``download_path``.
+
+        Returns:
+            ``{"media_type", "paths"}`` on a hit, None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            objects = [(self._object_path(f["sha256"], f["name"]), f["name"]) for f in entry["files"]]
+            if not all(obj.exists() for obj, _ in objects):
+                del self._entries[key]
+                self._save()
+                return None
+            entry["last_used"] = time.time()
+        paths = []
+        for obj, name in objects:
+            target = Path(download_path) / name
+            if not target.exists():
+                _link_or_copy(obj, target)
+            paths.append(str(target.resolve()))
+        return {"media_type": entry["media_type"], "paths": paths}
+
+    def put(self, key: str, paths: List[Any], media_type: str) -> None:
+        """Record freshly downloaded files for ``key``.
+
+        A file whose content is already cached is replaced by a link to the
+        existing object, so duplicates take no extra disk space.
+        """
+        files = []
+        for path in map(Path, paths):
+            sha256 = _file_sha256(path)
+            obj = self._object_path(sha256, path.name)
+            if obj.exists():
+                tmp = path.with_name(path.name + ".tmp")
+                _link_or_copy(obj, tmp)
+                os.replace(tmp, path)
+            else:
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                _link_or_copy(path, obj)
+            files.append({"sha256": sha256, "name": path.name, "size": obj.stat().st_size})
+        with self._lock:
+            self._entries[key] = {"media_type": media_type, "files": files, "last_used": time.time()}
+            self._evict()
+            self._save()
+
+    def flush(self) -> None:
+        """Persist access times recorded by ``get``."""
+        with self._lock:
+            self._save()
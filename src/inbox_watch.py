@@ -0,0 +1,109 @@
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+def _epoch(value: Any) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value or 0)
+
+
+def thread_signature(thread) -> Tuple[float, Optional[str]]:
+    """``(last_activity_at, newest message id)`` of a thread as epoch seconds and str."""
+    newest = max(thread.messages, key=lambda m: _epoch(m.timestamp), default=None)
+    return _epoch(thread.last_activity_at), str(newest.id) if newest is not None else None
+
+
+def encode_snapshot(threads: List[Any], taken_at: float) -> str:
+    """Opaque cursor recording what the caller has already seen of the inbox."""
+    payload = {"t": taken_at, "s": {str(t.id): list(thread_signature(t)) for t in threads}}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+
+def decode_snapshot(cursor: str) -> Tuple[float, Dict[str, List[Any]]]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(payload["t"]), payload["s"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+
+def diff_inbox(snapshot: Dict[str, List[Any]], taken_at: float, threads: List[Any]) -> List[Tuple[Any, List[Any], bool]]:
+    """Threads that changed since ``snapshot`` and their new messages.
+
+    A thread counts as changed when its last activity or newest message
+    differs. New messages are those newer than the thread's last activity in
+    the snapshot (or than the snapshot itself for threads it did not list).
+
+    Returns:
+        ``(thread, new_messages, maybe_more)`` tuples; ``maybe_more`` is True
+        when every message the inbox returned for the thread is new, so older
+        unseen messages may not be included.
+    """
+    changes = []
+    for thread in threads:
+        seen = snapshot.get(str(thread.id))
+        if seen is not None and tuple(seen) == thread_signature(thread):
+            continue
+        since = seen[0] if seen is not None else taken_at
+        new_messages = sorted(
+            (m for m in thread.messages if _epoch(m.timestamp) > since),
+            key=lambda m: _epoch(m.timestamp),
+        )
+        maybe_more = bool(thread.messages) and len(new_messages) == len(thread.messages)
+        changes.append((thread, new_messages, maybe_more))
+    return changes
+
+
+class InboxPoller:
+    """Shares inbox fetches between watchers of one account and adapts how often they happen.
+
+    A fetch is reused until the current interval has passed. The interval
+    drops back to ``min_interval`` whenever a fetch finds the inbox changed,
+    and grows by ``backoff`` after each fetch that finds it unchanged, up to
+    ``max_interval``.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, backoff: float = 1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.threads: Optional[List[Any]] = None
+        # Threads the last fetch asked for; fewer come back when the inbox is smaller
+        self.amount = 0
+        self.fetched_at = 0.0
+        self.taken_at = 0.0
+        self._signatures: Optional[Dict[str, Tuple[float, Optional[str]]]] = None
+        self._lock = asyncio.Lock()
+
+    def next_poll_in(self) -> float:
+        return max(0.0, self.fetched_at + self.interval - time.monotonic())
+
+    async def latest(self, fetch: Callable[[int], Awaitable[List[Any]]], amount: int) -> List[Any]:
+        """The inbox's ``amount`` newest threads as of the last fetch, fetching again if it is due or asked for fewer.
+
+        ``fetch(n)`` lists the ``n`` newest threads. A fetch asks for the most
+        any watcher has wanted so far, so watchers with different amounts
+        still share it.
+        """
+        async with self._lock:
+            stale = time.monotonic() - self.fetched_at >= self.interval
+            if self.threads is None or stale or amount > self.amount:
+                taken_at = time.time()
+                wanted = max(amount, self.amount)
+                threads = await fetch(wanted)
+                self.amount = wanted
+                signatures = {str(t.id): thread_signature(t) for t in threads}
+                if self._signatures is not None:
+                    if signatures != self._signatures:
+                        self.interval = self.min_interval
+                    else:
+                        self.interval = min(self.max_interval, self.interval * self.backoff)
+                self.threads, self._signatures = threads, signatures
+                self.fetched_at, self.taken_at = time.monotonic(), taken_at
+            return self.threads[:amount]
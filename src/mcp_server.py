@@ -1,11 +1,35 @@
-from mcp.server.fastmcp import FastMCP
-from instagrapi import Client
+from mcp.server.fastmcp import Context, FastMCP
 import argparse
-from typing import Optional, List, Dict, Any
+import asyncio
+import base64
+import functools
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 import os
+import signal
+import sys
+import threading
+import uuid
 from dotenv import load_dotenv
 import logging
 from pathlib import Path
+from account_pool import Account, AccountPool
+from direct_upload import configure_direct_media, direct_send_prepared_photo, rupload_photo, sent_items
+from download_cache import DownloadCache
+from inbox_watch import InboxPoller, decode_snapshot, diff_inbox, encode_snapshot
+from message_store import MessageStore, fetch_thread_by_participants, fetch_thread_page
+from metrics import Metrics
+from photo_prep import PhotoPreprocessor
+from profile_cache import ProfileCache
+from projection import project
+from rate_limiter import RateLimiter
+from send_queue import STATUSES as SEND_STATUSES, SendQueue
+from serializers import serialize_message, serialize_thread, thread_summary
+from thread_cache import ThreadCache
+from user_cache import UserIdCache
 
 # Load environment variables from .env file
 load_dotenv()
@@ -18,31 +42,759 @@ INSTRUCTIONS = """
 This server is used to send messages to a user on Instagram.
 """
 
-client = Client()
+# Logged-in accounts; the first one added is the default for every tool.
+# Each account runs its blocking instagrapi calls on its own worker pool so one
+# slow request never stalls the server.
+accounts = AccountPool()
+MAX_WORKERS = int(os.getenv("INSTAGRAM_MAX_WORKERS", 4))
+
+# Default (requests per minute, burst) per endpoint class; override with
+# INSTAGRAM_RATE_LIMIT_<CLASS>="per_minute,burst", e.g. INSTAGRAM_RATE_LIMIT_SEND="10,2"
+RATE_LIMITS = {"read": (60, 10), "send": (20, 3), "upload": (6, 2), "search": (20, 5)}
+UPLOAD_METHODS = (
+    "direct_send_photo", "direct_send_video", "direct_send_file", "photo_rupload", "video_rupload",
+    "direct_send_prepared_photo", "rupload_photo",
+)
+SEND_METHOD_PREFIXES = (
+    "direct_send", "direct_answer", "direct_message_seen", "direct_message_delete",
+    "direct_thread_mute", "direct_thread_unmute", "media_like", "media_unlike", "configure_direct",
+)
+SEARCH_METHODS = ("search_users", "direct_search")
+# Calls whose answer does not depend on which account asks; spread over all accounts
+SHARED_READ_METHODS = ("user_id_from_username", "username_from_user_id", "user_info_by_username", "search_users")
+# Media downloads; instagrapi fetches the files outside its sessions, so metrics count them by file size
+DOWNLOAD_METHODS = ("photo_download", "video_download", "album_download", "photo_download_by_url", "video_download_by_url")
+# Reads whose concurrent identical calls share one upstream request
+COALESCED_METHODS = SHARED_READ_METHODS + DOWNLOAD_METHODS + (
+    "user_stories", "user_medias", "user_followers", "user_following",
+    "user_followers_v1_chunk", "user_following_v1_chunk", "media_info",
+    "fetch_thread_page", "fetch_thread_by_participants", "direct_threads", "direct_thread", "direct_pending_inbox",
+    "direct_search", "direct_thread_by_participants", "direct_users_presence",
+)
+THROTTLE_ERRORS = ("ClientThrottledError", "FeedbackRequired", "PleaseWaitFewMinutes", "RateLimitError")
+# Responses meaning Instagram refused a send, so it did not go out
+SEND_REJECTED_ERRORS = ("ClientBadRequestError", "ClientForbiddenError", "ClientNotFoundError", "ChallengeRequired", "LoginRequired")
+# Login failures that retrying cannot fix (ChallengeError covers every challenge form)
+LOGIN_REJECTED_ERRORS = ("BadPassword", "BadCredentials", "TwoFactorRequired", "ChallengeError")
+
+
+def _ig_errors(*names: str) -> tuple:
+    """instagrapi exception classes by name (instagrapi is imported on first use to keep startup fast)."""
+    from instagrapi import exceptions
+    return tuple(getattr(exceptions, name) for name in names)
+
+
+def _new_client():
+    from instagrapi import Client
+    return Client()
+
+
+def _rate_limit_setting(endpoint_class: str, per_minute: float, burst: int):
+    value = os.getenv(f"INSTAGRAM_RATE_LIMIT_{endpoint_class.upper()}")
+    if not value:
+        return per_minute, burst
+    per_minute_str, _, burst_str = value.partition(",")
+    return float(per_minute_str), int(burst_str) if burst_str else burst
+
+
+def _add_account(username: str, password: Optional[str]) -> Account:
+    """Register an account with its own worker pool and rate limits; it logs in on first use."""
+    rate_limiter = RateLimiter({name: _rate_limit_setting(name, *limit) for name, limit in RATE_LIMITS.items()})
+    return accounts.add(Account(username, password, _new_client, rate_limiter, MAX_WORKERS, response_hook=metrics.record_response))
+
+# Local state (caches, stores) lives here; override with INSTAGRAM_DATA_DIR
+DATA_DIR = Path(os.getenv("INSTAGRAM_DATA_DIR", ".instagram_dm_mcp"))
+
+user_id_cache = UserIdCache(
+    DATA_DIR / "users.db",
+    ttl=float(os.getenv("INSTAGRAM_USER_ID_TTL", 7 * 24 * 3600)),
+    negative_ttl=float(os.getenv("INSTAGRAM_USER_ID_NEGATIVE_TTL", 3600)),
+)
+
+# get_user_info / search_users results: served from memory, refreshed in the
+# background once older than the soft TTL, dropped after the hard TTL
+profile_cache = ProfileCache(
+    max_entries=int(os.getenv("INSTAGRAM_PROFILE_CACHE_SIZE", 2000)),
+    soft_ttl=float(os.getenv("INSTAGRAM_PROFILE_SOFT_TTL", 300)),
+    hard_ttl=float(os.getenv("INSTAGRAM_PROFILE_HARD_TTL", 24 * 3600)),
+)
+_background_tasks: set = set()
+
+# Local copy of DM threads, kept current with small delta fetches
+message_store = MessageStore(DATA_DIR / "messages.db")
+SYNC_PAGE_SIZE = 20
+SYNC_MAX_DELTA_PAGES = 5
+# How long an activity check (from list_chats or a sync) counts as current, in seconds
+SYNC_MAX_AGE = float(os.getenv("INSTAGRAM_SYNC_MAX_AGE", 10))
+# Threads as get_thread_details returns them, reused while their activity is unchanged
+thread_cache = ThreadCache(max_entries=int(os.getenv("INSTAGRAM_THREAD_CACHE_SIZE", 200)))
+# Upper bound on older pages walked when looking up a message by id
+FIND_MAX_PAGES = int(os.getenv("INSTAGRAM_FIND_MAX_PAGES", 50))
+
+# Defaults for bulk media downloads
+DOWNLOAD_CONCURRENCY = int(os.getenv("INSTAGRAM_DOWNLOAD_CONCURRENCY", 4))
+DOWNLOADS_PER_SECOND = float(os.getenv("INSTAGRAM_DOWNLOADS_PER_SECOND", 2))
+
+# Downloaded media, deduplicated by content hash and keyed by media pk
+download_cache = DownloadCache(
+    DATA_DIR / "media",
+    max_bytes=int(float(os.getenv("INSTAGRAM_DOWNLOAD_CACHE_MB", 2048)) * 1024 * 1024),
+)
+# Keyed by (account username, thread id), like the message store
+_thread_sync_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+# Photos are cropped, scaled and re-encoded for upload in worker processes and
+# cached by content hash; INSTAGRAM_PHOTO_PREPROCESS=0 leaves it to instagrapi
+photo_preprocessor = PhotoPreprocessor(
+    DATA_DIR / "photos",
+    enabled=os.getenv("INSTAGRAM_PHOTO_PREPROCESS", "1").lower() not in ("0", "false", "no"),
+    quality=int(os.getenv("INSTAGRAM_PHOTO_QUALITY", 75)),
+    max_bytes=int(float(os.getenv("INSTAGRAM_PHOTO_CACHE_MB", 256)) * 1024 * 1024),
+    workers=int(os.getenv("INSTAGRAM_PHOTO_WORKERS", 2)),
+)
+
+# check_user_online_status asks for at most this many users per presence request,
+# and reuses answers for PRESENCE_TTL seconds
+PRESENCE_BATCH_SIZE = 50
+PRESENCE_TTL = float(os.getenv("INSTAGRAM_PRESENCE_TTL", 5))
+_presence_cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+
+# watch_inbox polls each account's inbox between these intervals (seconds)
+WATCH_MIN_INTERVAL = float(os.getenv("INSTAGRAM_WATCH_MIN_INTERVAL", 5))
+WATCH_MAX_INTERVAL = float(os.getenv("INSTAGRAM_WATCH_MAX_INTERVAL", 60))
+WATCH_MAX_TIMEOUT = 300
+_inbox_pollers: Dict[str, InboxPoller] = {}
+
+# Sends queued with queue_message, drained in the background within each
+# account's send/upload rate limits; see SendQueue for the delivery guarantee
+# Seconds a process may go without renewing its send lease before others take over its unfinished sends
+SEND_QUEUE_LEASE = 60
+# Seconds a drainer waits after an error reading or writing the journal
+SEND_QUEUE_ERROR_BACKOFF = 5
+send_queue = SendQueue(DATA_DIR / "outbox.db", lease_seconds=SEND_QUEUE_LEASE)
+SEND_QUEUE_WORKERS = int(os.getenv("INSTAGRAM_SEND_QUEUE_WORKERS", 2))
+SEND_QUEUE_MAX_ATTEMPTS = int(os.getenv("INSTAGRAM_SEND_QUEUE_MAX_ATTEMPTS", 5))
+SEND_METHODS = {"text": "direct_send", "video": "direct_send_video"}
+# Conversations one send_photo_to_many/send_video_to_many request may post to
+FAN_OUT_MAX_CHUNK = 50
+# Messages one send_messages_bulk call may send
+BULK_MAX_RECIPIENTS = 1000
+_send_queue_wake = asyncio.Event()
+# Background tasks of the send queue by name: the lease keeper and the drainers
+_send_tasks: Dict[str, asyncio.Task] = {}
+_open_sessions = 0
+
+
+@asynccontextmanager
+async def _lifespan(server) -> AsyncIterator[None]:
+    """Deliver queued sends, including those left by an earlier run, while clients are connected.
+
+    Over stdio the one session lasts as long as the process. Over HTTP every
+    client session enters this: the first one starts the send queue tasks and
+    the last one to leave cancels them.
+    """
+    global _open_sessions
+    _open_sessions += 1
+    try:
+        await _start_send_drainers()
+        yield
+    finally:
+        _open_sessions -= 1
+        if not _open_sessions:
+            await _stop_send_drainers()
+
 
 mcp = FastMCP(
    name="Instagram DMs",
-   instructions=INSTRUCTIONS
+   instructions=INSTRUCTIONS,
+   lifespan=_lifespan
 )
 
+# Tool latency, errors and the Instagram calls each tool makes
+metrics = Metrics()
+
+
+# Tool calls allowed to run at once across all connected clients; the rest queue
+MAX_CONCURRENT_REQUESTS = int(os.getenv("INSTAGRAM_MAX_CONCURRENT_REQUESTS", 32))
+_request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+
+def _limit_concurrency(fn, take_slot: bool = True):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not take_slot:
+            return await fn(*args, **kwargs)
+        async with _request_slots:
+            return await fn(*args, **kwargs)
+    return wrapper
+
+
+def mcp_tool(long_poll: bool = False):
+    """Register an MCP tool, recording metrics around every call.
+
+    Calls beyond ``MAX_CONCURRENT_REQUESTS`` wait for a free slot; the wait
+    counts towards the tool's recorded latency.
+
+    Args:
+        long_poll: The tool mostly sleeps waiting for something to happen.
+            It takes no slot, so enough waiting callers cannot starve every
+            other tool; its Instagram calls are still rate limited.
+    """
+    def register(fn):
+        return mcp.tool()(metrics.instrument(_limit_concurrency(fn, take_slot=not long_poll)))
+    return register
+
+
+@mcp.resource("metrics://server", name="server_metrics", description="Per-tool latency and error counts, and the Instagram calls, HTTP requests and bytes each tool caused.", mime_type="application/json")
+def server_metrics() -> str:
+    return json.dumps(metrics.snapshot(), indent=2)
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request):
+    """Prometheus scrape endpoint (served when running over HTTP)."""
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+def _endpoint_class(method_name: str) -> str:
+    """Rate limit bucket for a client method: upload, send, search or read."""
+    if method_name in UPLOAD_METHODS:
+        return "upload"
+    if method_name.startswith(SEND_METHOD_PREFIXES):
+        return "send"
+    if method_name in SEARCH_METHODS:
+        return "search"
+    return "read"
+
+
+async def _ensure_logged_in(target: Account) -> None:
+    try:
+        await asyncio.to_thread(target.ensure_logged_in)
+    except _ig_errors(*LOGIN_REJECTED_ERRORS) as e:
+        if target is not accounts.get():
+            accounts.remove(target.username)
+            logger.error(f"Failed to login additional account {target.username}, dropping it: {str(e)}")
+        else:
+            logger.error(f"Failed to login to Instagram: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Failed to login {target.username}, will retry on the next call: {str(e)}")
+        raise
+
+
+async def _run_with_relogin(target: Account, method, *args, **kwargs):
+    generation = target.worker_pool.generation
+    try:
+        return await target.worker_pool.call(method, *args, **kwargs)
+    except _ig_errors("LoginRequired"):
+        # Calls failing together log in once; the others retry on the new session
+        logger.info(f"Session of {target.username} expired; logging in again")
+        await asyncio.to_thread(target.relogin, generation)
+        return await target.worker_pool.call(method, *args, **kwargs)
+
+
+_in_flight: Dict[Any, asyncio.Task] = {}
+
+
+def _forget_in_flight(key, task: asyncio.Task) -> None:
+    _in_flight.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # mark it retrieved even if every waiter went away
+
+
+async def _call(method, *args, account: Optional[str] = None, **kwargs):
+    """Run a blocking ``Client`` method (name or ``fn(client, ...)``) on an account's worker pool.
+
+    Concurrent identical reads (same account, method and arguments, see
+    ``COALESCED_METHODS``) share a single upstream request and its result, so
+    callers must treat results as read-only. A caller being cancelled does not
+    cancel the shared request.
+    """
+    method_name = method if isinstance(method, str) else method.__name__
+    if method_name not in COALESCED_METHODS:
+        return await _call_upstream(method, method_name, account, args, kwargs)
+    key = (account, method_name, repr(args), repr(sorted(kwargs.items())))
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_call_upstream(method, method_name, account, args, kwargs))
+        _in_flight[key] = task
+        task.add_done_callback(functools.partial(_forget_in_flight, key))
+    else:
+        metrics.record_coalesced(method_name)
+    return await asyncio.shield(task)
+
+
+async def _call_upstream(method, method_name: str, account: Optional[str], args, kwargs):
+    """Make one upstream call.
+
+    ``account`` picks the account; when it is None, account-independent reads
+    go to whichever account has the most spare rate limit and everything else
+    to the default account. Every upstream call waits for a token from that
+    account's rate limiter first, and reports throttling responses back to it.
+    The account logs in on its first call, and once more if Instagram reports
+    its session as expired.
+    """
+    endpoint_class = _endpoint_class(method_name)
+    if account is None and method_name in SHARED_READ_METHODS:
+        target = accounts.pick_for_read(endpoint_class)
+    else:
+        target = accounts.get(account)
+    if not target.logged_in:
+        await _ensure_logged_in(target)
+    waited = await target.rate_limiter.acquire(endpoint_class)
+    if waited > 1:
+        logger.info(f"Waited {waited:.1f}s for the {endpoint_class} rate limit of {target.username}")
+    try:
+        with metrics.upstream_call(method_name) as call:
+            result = await _run_with_relogin(target, method, *args, **kwargs)
+            if method_name in DOWNLOAD_METHODS:
+                call.add_downloads(result)
+    except _ig_errors(*THROTTLE_ERRORS) as e:
+        pause = target.rate_limiter.report_throttled(endpoint_class)
+        logger.warning(f"Instagram throttled a {endpoint_class} call for {target.username} ({type(e).__name__}); pausing {endpoint_class} calls for {pause:.0f}s")
+        raise
+    target.rate_limiter.report_success(endpoint_class)
+    return result
+
+
+def _account_name(account: Optional[str] = None) -> str:
+    """Username of the account a call acts as; what the message store and thread cache are keyed by."""
+    return accounts.get(account).username
+
+
+def _media_pk_from_url(url: str, account: Optional[str] = None) -> str:
+    """Media pk of a post or reel URL; parsed locally, no request is made."""
+    target = accounts.get(account)
+    target.prepare()
+    return target.client.media_pk_from_url(url)
 
-@mcp.tool()
-def send_message(username: str, message: str) -> Dict[str, Any]:
+
+async def _resolve_user_id(username: str, account: Optional[str] = None) -> Optional[str]:
+    """Resolve a username to a user ID, consulting the local cache first.
+
+    Memory hits are answered on the event loop; the cache's SQLite side is
+    only read and written from a worker thread.
+    """
+    found, user_id = user_id_cache.get_cached(username)
+    if not found:
+        found, user_id = await asyncio.to_thread(user_id_cache.get, username)
+    if found:
+        return user_id
+    try:
+        user_id = await _call("user_id_from_username", username, account=account)
+    except _ig_errors("UserNotFound"):
+        await asyncio.to_thread(user_id_cache.set_missing, username)
+        return None
+    if user_id:
+        await asyncio.to_thread(user_id_cache.set, username, user_id)
+    return user_id
+
+
+async def _prepared_photo(photo_path: str) -> Optional[Path]:
+    """The preprocessed copy of a photo, or None to let instagrapi prepare it (disabled or failed)."""
+    if not photo_preprocessor.enabled:
+        return None
+    try:
+        return await photo_preprocessor.prepare(photo_path)
+    except Exception as e:
+        logger.warning(f"Could not preprocess {photo_path}, sending it through instagrapi: {str(e)}")
+        return None
+
+
+async def _direct_send_photo(photo_path: str, user_ids: List[str], account: Optional[str] = None):
+    """Send a photo, preprocessed off the event loop and uploaded as is when possible."""
+    prepared = await _prepared_photo(photo_path)
+    if prepared is not None:
+        return await _call(direct_send_prepared_photo, prepared, user_ids, account=account)
+    return await _call("direct_send_photo", Path(photo_path), user_ids, account=account)
+
+
+async def _upload_for_direct(kind: str, path: str, account: Optional[str] = None) -> str:
+    """Upload a photo or video once for sending in DMs; returns its upload id."""
+    if kind == "video":
+        return (await _call("video_rupload", Path(path), to_direct=True, account=account))[0]
+    prepared = await _prepared_photo(path)
+    if prepared is not None:
+        return (await _call(rupload_photo, prepared, account=account))[0]
+    return (await _call("photo_rupload", Path(path), account=account))[0]
+
+
+async def _fan_out_media(
+    kind: str,
+    path: str,
+    usernames: Optional[List[str]],
+    thread_ids: Optional[List[str]],
+    chunk_size: int,
+    account: Optional[str],
+) -> Dict[str, Any]:
+    """Upload ``path`` once and post it to every recipient, ``chunk_size`` conversations per request.
+
+    Each person gets the media once: usernames are compared case-insensitively,
+    and usernames resolving to the same user share the first one's outcome.
+    """
+    if not os.path.exists(path):
+        return {"success": False, "message": f"File not found: {path}"}
+    unique: Dict[str, str] = {}
+    for username in usernames or []:
+        if username and username.strip():
+            username = username.strip().lstrip("@")
+            unique.setdefault(username.lower(), username)
+    usernames = list(unique.values())
+    thread_ids = list(dict.fromkeys(str(t) for t in thread_ids or [] if t))
+    if not usernames and not thread_ids:
+        return {"success": False, "message": "At least one username or thread_id must be provided."}
+    chunk_size = max(1, min(chunk_size, FAN_OUT_MAX_CHUNK))
+
+    results: List[Dict[str, Any]] = []
+    user_targets: List[Dict[str, Any]] = []
+    by_user_id: Dict[str, Dict[str, Any]] = {}
+    duplicates: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    resolved = await asyncio.gather(*(_resolve_user_id(u, account) for u in usernames), return_exceptions=True)
+    for username, user_id in zip(usernames, resolved):
+        result = {"username": username}
+        results.append(result)
+        if isinstance(user_id, BaseException):
+            result.update(success=False, message=str(user_id))
+        elif not user_id:
+            result.update(success=False, message=f"User '{username}' not found.")
+        elif str(user_id) in by_user_id:
+            result["user_id"] = str(user_id)
+            duplicates.append((result, by_user_id[str(user_id)]))
+        else:
+            result["user_id"] = str(user_id)
+            by_user_id[str(user_id)] = result
+            user_targets.append(result)
+    thread_targets = [{"thread_id": thread_id} for thread_id in thread_ids]
+    results.extend(thread_targets)
+    pending = user_targets + thread_targets
+    if not pending:
+        return {"success": False, "message": "None of the usernames could be resolved.", "sent": 0, "failed": len(results), "results": results}
+
+    try:
+        upload_id = await _upload_for_direct(kind, path, account)
+    except Exception as e:
+        for result in pending + [result for result, _ in duplicates]:
+            result.update(success=False, message=f"Upload failed: {str(e)}")
+        return {"success": False, "message": f"Upload failed: {str(e)}", "sent": 0, "failed": len(results), "results": results}
+
+    async def post(chunk: List[Dict[str, Any]], by_thread: bool) -> None:
+        if by_thread:
+            target = {"thread_ids": [r["thread_id"] for r in chunk]}
+        else:
+            target = {"recipients": [[r["user_id"]] for r in chunk]}
+        try:
+            response = await _call(configure_direct_media, kind, upload_id, account=account, **target)
+        except Exception as e:
+            for result in chunk:
+                result.update(success=False, message=str(e))
+            return
+        items = sent_items(response)
+        for i, result in enumerate(chunk):
+            result["success"] = True
+            # Per-conversation ids are only known when Instagram lists one per recipient
+            item = items[i] if len(items) == len(chunk) else {}
+            if item.get("item_id"):
+                result["direct_message_id"] = item["item_id"]
+            if item.get("thread_id"):
+                result["thread_id"] = item["thread_id"]
+
+    chunks = [(user_targets[i:i + chunk_size], False) for i in range(0, len(user_targets), chunk_size)]
+    chunks += [(thread_targets[i:i + chunk_size], True) for i in range(0, len(thread_targets), chunk_size)]
+    await asyncio.gather(*(post(chunk, by_thread) for chunk, by_thread in chunks))
+    for result, original in duplicates:
+        result.update({key: original[key] for key in ("success", "message", "direct_message_id", "thread_id") if key in original})
+        result["duplicate_of"] = original["username"]
+    viewer = _account_name(account)
+    await _threads_changed(account, *(
+        result.get("thread_id") or thread_cache.thread_for(viewer, [result["user_id"]])
+        for result in pending if result.get("success")
+    ))
+    sent = sum(1 for result in results if result.get("success"))
+    return {
+        "success": sent > 0,
+        "message": f"Sent to {sent} of {len(results)} recipients with one upload.",
+        "sent": sent,
+        "failed": len(results) - sent,
+        "results": results,
+    }
+
+
+async def _start_send_drainers() -> None:
+    """Start the background tasks that deliver queued sends, replacing any that have ended."""
+    if not _send_tasks:
+        try:
+            await asyncio.to_thread(send_queue.heartbeat)
+            await asyncio.to_thread(_recover_sends)
+        except Exception as e:
+            # The lease keeper tries again shortly
+            logger.error(f"Could not take the send queue lease: {str(e)}")
+    wanted = {"lease": _keep_send_lease}
+    wanted.update({f"drain-{i}": _drain_send_queue for i in range(max(1, SEND_QUEUE_WORKERS))})
+    for name, run in wanted.items():
+        task = _send_tasks.get(name)
+        if task is None or task.done():
+            if task is not None and not task.cancelled() and task.exception() is not None:
+                logger.error(f"Send queue task {name} ended: {task.exception()}; restarting it")
+            _send_tasks[name] = asyncio.ensure_future(run())
+
+
+async def _stop_send_drainers() -> None:
+    tasks = list(_send_tasks.values())
+    _send_tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _recover_sends() -> None:
+    recovered = send_queue.recover()
+    if recovered:
+        logger.warning(f"{recovered} queued send(s) were interrupted by a server that stopped; marked them unknown instead of sending again")
+
+
+async def _keep_send_lease() -> None:
+    """Renew this process's send lease, take over what stopped processes left ``sending`` and restart ended drainers."""
+    while True:
+        await asyncio.sleep(SEND_QUEUE_LEASE / 3)
+        try:
+            await asyncio.to_thread(send_queue.heartbeat)
+            await asyncio.to_thread(_recover_sends)
+        except Exception as e:
+            logger.error(f"Could not renew the send queue lease: {str(e)}")
+        await _start_send_drainers()
+
+
+async def _drain_send_queue() -> None:
+    while True:
+        _send_queue_wake.clear()
+        try:
+            # Only entries this process can send; other processes drain their own accounts
+            usernames = [account.username for account in accounts]
+            entry = await asyncio.to_thread(send_queue.claim_next, usernames)
+            if entry is None:
+                due_in = await asyncio.to_thread(send_queue.next_due_in, usernames)
+                try:
+                    await asyncio.wait_for(_send_queue_wake.wait(), due_in)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await _deliver_queued(entry)
+            except Exception as e:
+                logger.error(f"Queued send {entry['send_id']} ended in an unexpected error: {str(e)}")
+                await asyncio.to_thread(send_queue.mark_unknown, entry["send_id"], str(e))
+        except Exception as e:
+            # E.g. the journal staying locked by another process; a drainer must outlive it
+            logger.error(f"Send queue drainer failed: {str(e)}; retrying in {SEND_QUEUE_ERROR_BACKOFF}s")
+            await asyncio.sleep(SEND_QUEUE_ERROR_BACKOFF)
+            continue
+        # A finished send may unblock the next one to the same recipient
+        _send_queue_wake.set()
+
+
+async def _retry_or_fail(entry: Dict[str, Any], error: Exception) -> None:
+    message = f"{type(error).__name__}: {error}"
+    if entry["attempts"] >= SEND_QUEUE_MAX_ATTEMPTS:
+        await asyncio.to_thread(send_queue.mark_failed, entry["send_id"], message)
+    else:
+        await asyncio.to_thread(send_queue.retry_later, entry["send_id"], min(900, 30 * 2 ** (entry["attempts"] - 1)), message)
+
+
+async def _deliver_queued(entry: Dict[str, Any]) -> None:
+    """Send one claimed queue entry and record the outcome.
+
+    Failures before the send request (resolving the recipient, throttling,
+    refusals) leave the message undelivered and are retried or failed; any
+    other error during the send may have happened after Instagram accepted
+    it, so the entry is marked unknown rather than retried.
+    """
+    send_id, account, kind = entry["send_id"], entry["account"], entry["kind"]
+    try:
+        accounts.get(account)
+        user_id = await _resolve_user_id(entry["username"], account)
+    except ValueError as e:
+        await asyncio.to_thread(send_queue.mark_failed, send_id, str(e))
+        return
+    except Exception as e:
+        await _retry_or_fail(entry, e)
+        return
+    if not user_id:
+        await asyncio.to_thread(send_queue.mark_failed, send_id, f"User '{entry['username']}' not found.")
+        return
+    if kind != "text" and not os.path.exists(entry["content"]):
+        await asyncio.to_thread(send_queue.mark_failed, send_id, f"File not found: {entry['content']}")
+        return
+    try:
+        if kind == "photo":
+            dm = await _direct_send_photo(entry["content"], [user_id], account)
+        else:
+            content = entry["content"] if kind == "text" else Path(entry["content"])
+            dm = await _call(SEND_METHODS[kind], content, [user_id], account=account)
+    except _ig_errors(*THROTTLE_ERRORS) as e:
+        await _retry_or_fail(entry, e)
+    except _ig_errors(*SEND_REJECTED_ERRORS) as e:
+        await asyncio.to_thread(send_queue.mark_failed, send_id, f"{type(e).__name__}: {e}")
+    except Exception as e:
+        await asyncio.to_thread(send_queue.mark_unknown, send_id, f"{type(e).__name__}: {e}")
+    else:
+        message_id, thread_id = getattr(dm, "id", None), getattr(dm, "thread_id", None)
+        await _threads_changed(account, thread_id)
+        await asyncio.to_thread(send_queue.mark_sent, send_id, str(message_id) if message_id else None, str(thread_id) if thread_id else None)
+
+
+async def _fetch_older_page(thread_id: str, account: Optional[str] = None) -> bool:
+    """Store the next page of older history for a thread (caller holds its sync lock).
+
+    Returns:
+        False if the whole history is already stored, True otherwise.
+    """
+    owner = _account_name(account)
+    state = await asyncio.to_thread(message_store.thread_state, owner, thread_id)
+    if state is None or state["history_complete"] or not state["oldest_cursor"]:
+        return False
+    page, cursor = await _call(fetch_thread_page, thread_id, state["oldest_cursor"], SYNC_PAGE_SIZE, account=account)
+    await asyncio.to_thread(message_store.save_tail, owner, thread_id, page.messages, cursor)
+    return True
+
+
+def _thread_is_current(state: Optional[Dict[str, Any]]) -> bool:
+    """Whether a stored thread is known to hold everything up to its latest activity."""
+    return (
+        state is not None
+        and state["synced_activity_at"] is not None
+        and (state["last_activity_at"] or 0) <= state["synced_activity_at"]
+        and time.time() - (state["activity_checked_at"] or 0) < SYNC_MAX_AGE
+    )
+
+
+async def _sync_thread(thread_id: str, amount: int, account: Optional[str] = None) -> None:
+    """Bring the local copy of a thread up to date, holding at least ``amount`` messages.
+
+    Only pages newer than the stored head are fetched (normally one small
+    request, none if the thread is known to be unchanged), followed by older
+    pages when more history is wanted than is stored.
+    """
+    thread_id = str(thread_id)
+    owner = _account_name(account)
+    lock = _thread_sync_locks.setdefault((owner, thread_id), asyncio.Lock())
+    async with lock:
+        state = await asyncio.to_thread(message_store.thread_state, owner, thread_id)
+        if not _thread_is_current(state):
+            known = state["newest_item_id"] if state else None
+            pages, cursor, head, reached = [], None, None, False
+            while True:
+                page, cursor = await _call(fetch_thread_page, thread_id, cursor, SYNC_PAGE_SIZE, account=account)
+                head = head or page
+                ids = [str(m.id) for m in page.messages]
+                if known in ids:
+                    pages.append(page.messages[: ids.index(known)])
+                    reached = True
+                    break
+                pages.append(page.messages)
+                if known is None or not cursor or len(pages) >= SYNC_MAX_DELTA_PAGES:
+                    break
+            await asyncio.to_thread(message_store.save_head, owner, head, pages, cursor, reset=not reached)
+
+        while (await asyncio.to_thread(message_store.thread_state, owner, thread_id))["message_count"] < amount:
+            if not await _fetch_older_page(thread_id, account):
+                break
+
+
+async def _load_thread(thread_id: str, amount: int, account: Optional[str] = None):
+    """A thread with its ``amount`` newest messages, brought up to date first.
+
+    The thread is rebuilt from ``message_store`` only when its activity has
+    changed since ``thread_cache`` last saw it, so re-opening an unchanged
+    conversation makes no requests and reads nothing from disk. Callers must
+    treat the result as read-only.
+    """
+    thread_id = str(thread_id)
+    owner = _account_name(account)
+    await _sync_thread(thread_id, amount, account)
+    state = await asyncio.to_thread(message_store.thread_state, owner, thread_id)
+    if state is None:
+        return await _call("direct_thread", thread_id, amount, account=account)
+    thread = thread_cache.get(owner, thread_id, state["synced_activity_at"], amount)
+    if thread is None:
+        thread = await asyncio.to_thread(message_store.get_thread, owner, thread_id, amount) or await _call("direct_thread", thread_id, amount, account=account)
+        complete = state["history_complete"] and len(thread.messages) >= state["message_count"]
+        thread_cache.set(owner, thread, state["synced_activity_at"], complete)
+    return thread
+
+
+async def _threads_changed(account: Optional[str], *thread_ids) -> None:
+    """Make the next read of these threads ask Instagram, e.g. after ``account`` sent to them.
+
+    A listing or sync counts as current for ``SYNC_MAX_AGE`` seconds; without
+    this, changes made through this server would not show up until then.
+    """
+    owner = _account_name(account)
+    for thread_id in thread_ids:
+        if thread_id:
+            await asyncio.to_thread(message_store.mark_stale, owner, str(thread_id))
+
+
+async def _remember_users(users) -> None:
+    """Feed username/pk pairs we already have into the user ID cache (written off the event loop)."""
+    try:
+        await asyncio.to_thread(user_id_cache.remember, list(users or []))
+    except Exception as e:
+        logger.debug(f"Failed to cache users: {e}")
+
+
+async def _cached_lookup(key: str, fetch, max_age: Optional[float]):
+    """Stale-while-revalidate lookup through ``profile_cache``.
+
+    A cached value no older than ``max_age`` (any age within the hard TTL when
+    None) is returned at once, and a background refresh is started if it is
+    past the soft TTL. Otherwise ``fetch()`` is awaited and its result cached.
+
+    Returns:
+        ``(value, age_seconds)``; the age is 0 for a fresh fetch.
+    """
+    entry = profile_cache.get(key)
+    if entry is not None and (max_age is None or entry[1] <= max_age):
+        value, age = entry
+        if profile_cache.needs_refresh(key, age):
+            profile_cache.refresh_started(key)
+
+            async def refresh():
+                try:
+                    profile_cache.set(key, await fetch())
+                except Exception as e:
+                    logger.info(f"Background refresh of {key} failed: {e}")
+                finally:
+                    profile_cache.refresh_finished(key)
+
+            task = asyncio.create_task(refresh())
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        return value, age
+    value = await fetch()
+    profile_cache.set(key, value)
+    return value, 0.0
+
+
+@mcp_tool()
+async def send_message(username: str, message: str, account: Optional[str] = None) -> Dict[str, Any]:
     """Send an Instagram direct message to a user by username.
 
     Args:
         username: Instagram username of the recipient.
         message: The message text to send.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and a status message.
     """
     if not username or not message:
         return {"success": False, "message": "Username and message must be provided."}
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = await _resolve_user_id(username, account)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
-        dm = client.direct_send(message, [user_id])
+        dm = await _call("direct_send", message, [user_id], account=account)
+        await _threads_changed(account, getattr(dm, "thread_id", None))
         if dm:
             return {"success": True, "message": "Message sent to user.", "direct_message_id": getattr(dm, 'id', None)}
         else:
@@ -51,14 +803,15 @@ def send_message(username: str, message: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def send_photo_message(username: str, photo_path: str) -> Dict[str, Any]:
+@mcp_tool()
+async def send_photo_message(username: str, photo_path: str, account: Optional[str] = None) -> Dict[str, Any]:
     """Send a photo via Instagram direct message to a user by username.
 
     Args:
         username: Instagram username of the recipient.
         photo_path: Path to the photo file to send.
         message: Optional message text to accompany the photo.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and a status message.
     """
@@ -69,11 +822,12 @@ def send_photo_message(username: str, photo_path: str) -> Dict[str, Any]:
         return {"success": False, "message": f"Photo file not found: {photo_path}"}
     
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = await _resolve_user_id(username, account)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
-        result = client.direct_send_photo(Path(photo_path), [user_id])
+        result = await _direct_send_photo(photo_path, [user_id], account)
+        await _threads_changed(account, getattr(result, "thread_id", None))
         if result:
             return {"success": True, "message": "Photo sent successfully.", "direct_message_id": getattr(result, 'id', None)}
         else:
@@ -82,13 +836,14 @@ def send_photo_message(username: str, photo_path: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def send_video_message(username: str, video_path: str) -> Dict[str, Any]:
+@mcp_tool()
+async def send_video_message(username: str, video_path: str, account: Optional[str] = None) -> Dict[str, Any]:
     """Send a video via Instagram direct message to a user by username.
 
     Args:
         username: Instagram username of the recipient.
         video_path: Path to the video file to send.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and a status message.
     """
@@ -99,11 +854,12 @@ def send_video_message(username: str, video_path: str) -> Dict[str, Any]:
         return {"success": False, "message": f"Video file not found: {video_path}"}
     
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = await _resolve_user_id(username, account)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
 
-        result = client.direct_send_video(Path(video_path), [user_id])
+        result = await _call("direct_send_video", Path(video_path), [user_id], account=account)
+        await _threads_changed(account, getattr(result, "thread_id", None))
         if result:
             return {"success": True, "message": "Video sent successfully.", "direct_message_id": getattr(result, 'id', None)}
         else:
@@ -112,13 +868,255 @@ def send_video_message(username: str, video_path: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def list_chats(
+@mcp_tool()
+async def send_messages_bulk(
+    recipients: List[Dict[str, Any]],
+    template: Optional[str] = None,
+    max_concurrency: int = 4,
+    account: Optional[str] = None,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Send text DMs to many users in one call, each in their own conversation.
+
+    Recipients are resolved in parallel and messages sent with bounded
+    concurrency within the account's send rate limit. A failing recipient
+    does not stop the others; messages to the same username go out in order.
+    For very large or restart-safe campaigns use queue_message instead.
+
+    Args:
+        recipients: One entry per message, e.g. {"username": "alice", "message": "Hi"}; with a template,
+            {"username": "alice", "first_name": "Alice"} supplies its variables. An entry's own "message" wins over the template.
+        template: Message text with {variable} placeholders filled from each entry (e.g. "Hi {first_name}!").
+        max_concurrency: Sends in flight at once (1-16, default 4).
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, sent/failed counts and a result per entry, in input order.
+    """
+    if not recipients:
+        return {"success": False, "message": "At least one recipient must be provided."}
+    if len(recipients) > BULK_MAX_RECIPIENTS:
+        return {"success": False, "message": f"At most {BULK_MAX_RECIPIENTS} recipients per call; split the list or use queue_message."}
+
+    results: List[Dict[str, Any]] = []
+    by_username: Dict[str, List[Tuple[Dict[str, Any], str]]] = {}
+    for entry in recipients:
+        username = str(entry.get("username") or "").strip().lstrip("@")
+        result: Dict[str, Any] = {"username": username, "success": False}
+        results.append(result)
+        if not username:
+            result["message"] = "Username must be provided."
+            continue
+        text = entry.get("message")
+        if not text and template:
+            try:
+                text = template.format_map({key: str(value) for key, value in entry.items()})
+            except KeyError as e:
+                result["message"] = f"Missing template variable {e}."
+                continue
+            except (ValueError, IndexError) as e:
+                result["message"] = f"Invalid template: {e}"
+                continue
+        if not text:
+            result["message"] = "No message or template given."
+            continue
+        by_username.setdefault(username.lower(), []).append((result, str(text)))
+
+    total = len(results)
+    done = total - sum(len(messages) for messages in by_username.values())
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency, 16)))
+
+    async def report() -> None:
+        if ctx is None:
+            return
+        try:
+            await ctx.report_progress(done, total)
+        except Exception:
+            pass  # progress is best-effort; a client that went away must not stop the sends
+
+    async def send(text: str, user_id: str):
+        try:
+            return await _call("direct_send", text, [user_id], account=account)
+        except _ig_errors(*THROTTLE_ERRORS):
+            # Refused, so not delivered; the retry waits out the rate limiter's pause
+            return await _call("direct_send", text, [user_id], account=account)
+
+    async def send_all(username: str, messages: List[Tuple[Dict[str, Any], str]]) -> None:
+        nonlocal done
+        async with semaphore:
+            try:
+                user_id = await _resolve_user_id(username, account)
+                error = None if user_id else f"User '{username}' not found."
+            except Exception as e:
+                user_id, error = None, str(e)
+            for result, text in messages:
+                if user_id:
+                    try:
+                        dm = await send(text, user_id)
+                        thread_id = getattr(dm, "thread_id", None)
+                        await _threads_changed(account, thread_id)
+                        result.update(success=True, direct_message_id=getattr(dm, "id", None), thread_id=str(thread_id) if thread_id else None)
+                    except Exception as e:
+                        result["message"] = str(e)
+                else:
+                    result["message"] = error
+                done += 1
+                await report()
+
+    await report()
+    await asyncio.gather(*(send_all(messages[0][0]["username"], messages) for messages in by_username.values()))
+    sent = sum(1 for result in results if result["success"])
+    return {
+        "success": sent > 0,
+        "message": f"Sent {sent} of {total} messages.",
+        "sent": sent,
+        "failed": total - sent,
+        "results": results,
+    }
+
+
+@mcp_tool()
+async def send_photo_to_many(
+    photo_path: str,
+    usernames: Optional[List[str]] = None,
+    thread_ids: Optional[List[str]] = None,
+    chunk_size: int = 10,
+    account: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Send one photo to many users or threads, uploading it only once.
+
+    Each user gets the photo in their own one-to-one conversation.
+
+    Args:
+        photo_path: Path to the photo file to send.
+        usernames: Instagram usernames of the recipients.
+        thread_ids: Existing DM threads to send the photo to.
+        chunk_size: Conversations posted to per request (1-50, default 10).
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, sent/failed counts and a result per recipient.
+    """
+    try:
+        return await _fan_out_media("photo", photo_path, usernames, thread_ids, chunk_size, account)
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+@mcp_tool()
+async def send_video_to_many(
+    video_path: str,
+    usernames: Optional[List[str]] = None,
+    thread_ids: Optional[List[str]] = None,
+    chunk_size: int = 10,
+    account: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Send one video to many users or threads, uploading it only once.
+
+    Each user gets the video in their own one-to-one conversation.
+
+    Args:
+        video_path: Path to the video file to send.
+        usernames: Instagram usernames of the recipients.
+        thread_ids: Existing DM threads to send the video to.
+        chunk_size: Conversations posted to per request (1-50, default 10).
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, sent/failed counts and a result per recipient.
+    """
+    try:
+        return await _fan_out_media("video", video_path, usernames, thread_ids, chunk_size, account)
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+@mcp_tool()
+async def queue_message(
+    username: str,
+    message: Optional[str] = None,
+    photo_path: Optional[str] = None,
+    video_path: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    account: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Queue a direct message (text, photo or video) to be sent in the background.
+
+    The queue is stored on disk and drained within the account's rate limits,
+    so many messages can be queued at once. Each message is sent at most once
+    per idempotency key: queuing again with the same key returns the existing
+    entry instead of sending twice. Check progress with get_send_status.
+
+    Args:
+        username: Instagram username of the recipient.
+        message: Text to send.
+        photo_path: Path to a photo to send instead of text.
+        video_path: Path to a video to send instead of text.
+        idempotency_key: Caller-chosen unique key for this message (default: a new random key).
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, whether the key was a duplicate, and the queue entry.
+    """
+    contents = {"text": message, "photo": photo_path, "video": video_path}
+    given = [kind for kind, value in contents.items() if value]
+    if not username or len(given) != 1:
+        return {"success": False, "message": "Username and exactly one of message, photo_path or video_path must be provided."}
+    kind = given[0]
+    content = contents[kind]
+    if kind != "text":
+        if not os.path.exists(content):
+            return {"success": False, "message": f"File not found: {content}"}
+        content = str(Path(content).resolve())
+    try:
+        sender = accounts.get(account).username
+        entry, created = await asyncio.to_thread(send_queue.enqueue, idempotency_key or uuid.uuid4().hex, sender, username.strip().lstrip("@"), kind, content)
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+    if created:
+        _send_queue_wake.set()
+        return {"success": True, "message": "Message queued.", "duplicate": False, "send": entry}
+    if (entry["account"], entry["username"].lower(), entry["kind"], entry["content"]) != (sender, username.strip().lstrip("@").lower(), kind, content):
+        return {"success": False, "message": "This idempotency key was already used for a different message.", "send": entry}
+    return {"success": True, "message": "A message with this idempotency key was already queued; nothing new was queued.", "duplicate": True, "send": entry}
+
+
+@mcp_tool()
+async def get_send_status(
+    send_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+) -> Dict[str, Any]:
+    """Status of messages queued with queue_message.
+
+    Statuses: queued, sending, sent, failed (not delivered) and unknown (the
+    send was interrupted after it may have reached Instagram; it is not retried).
+
+    Args:
+        send_id: Queue entry to look up.
+        idempotency_key: Look the entry up by its idempotency key instead.
+        status: Without an id or key, list only entries with this status.
+        limit: Without an id or key, how many of the newest entries to list (default 20).
+    Returns:
+        A dictionary with the matching entry, or the per-status counts and the newest entries.
+    """
+    if send_id is not None or idempotency_key:
+        entry = await asyncio.to_thread(send_queue.get, send_id, idempotency_key)
+        if entry is None:
+            return {"success": False, "message": "No queued message with that id or idempotency key."}
+        return {"success": True, "send": entry}
+    if status and status not in SEND_STATUSES:
+        return {"success": False, "message": f"status must be one of: {', '.join(SEND_STATUSES)}."}
+    counts = await asyncio.to_thread(send_queue.counts)
+    sends = await asyncio.to_thread(send_queue.recent, status, max(1, limit))
+    return {"success": True, "counts": counts, "sends": sends}
+
+
+@mcp_tool()
+async def list_chats(
     amount: int = 20,
     selected_filter: str = "",
     thread_message_limit: Optional[int] = None,
     full: bool = False,
     fields: Optional[List[str]] = None,
+    account: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Get Instagram Direct Message threads (chats) from the user's account, with optional filters and limits.
 
@@ -127,97 +1125,135 @@ def list_chats(
         selected_filter: Filter for threads ("", "flagged", or "unread").
         thread_message_limit: Limit for messages per thread.
         full: If True, return the full thread object for each chat (default False).
-        fields: If provided, return only these fields for each thread.
+        fields: If provided, return only these fields for each thread. Dotted paths and list
+            indexes are supported, e.g. "thread_title", "users.username", "messages[-1].text".
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and the list of threads or error message.
     """
-    def thread_summary(thread):
-        t = thread if isinstance(thread, dict) else thread.dict()
-        users = t.get("users", [])
-        user_summaries = [
-            {
-                "username": u.get("username"),
-                "full_name": u.get("full_name"),
-                "pk": u.get("pk")
-            }
-            for u in users
-        ]
-        return {
-            "thread_id": t.get("id"),
-            "thread_title": t.get("thread_title"),
-            "users": user_summaries,
-            "last_activity_at": t.get("last_activity_at"),
-            "last_message": t.get("messages", [{}])[-1] if t.get("messages") else None
-        }
-
-    def filter_fields(thread, fields):
-        t = thread if isinstance(thread, dict) else thread.dict()
-        return {field: t.get(field) for field in fields}
-
     try:
-        threads = client.direct_threads(amount, selected_filter, thread_message_limit)
+        threads = await _call("direct_threads", amount, selected_filter, thread_message_limit, account=account)
+        await _remember_users(u for t in threads for u in t.users)
+        viewer = _account_name(account)
+        await asyncio.to_thread(message_store.note_threads, viewer, threads)
+        thread_cache.note_threads(viewer, threads)
         if full:
-            return {"success": True, "threads": [t.dict() if hasattr(t, 'dict') else str(t) for t in threads]}
+            return {"success": True, "threads": [serialize_thread(t) for t in threads]}
         elif fields:
-            return {"success": True, "threads": [filter_fields(t, fields) for t in threads]}
+            return {"success": True, "threads": [project(t, fields) for t in threads]}
         else:
             return {"success": True, "threads": [thread_summary(t) for t in threads]}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def list_messages(thread_id: str, amount: int = 20) -> Dict[str, Any]:
+def _watch_message(message, viewer_id: Optional[str]) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "user_id": message.user_id,
+        "from_me": viewer_id is not None and str(message.user_id) == str(viewer_id),
+        "timestamp": message.timestamp,
+        "item_type": message.item_type,
+        "text": message.text,
+        "has_media": message.media is not None or message.clip is not None or message.media_share is not None,
+    }
+
+
+@mcp_tool(long_poll=True)
+async def watch_inbox(
+    cursor: Optional[str] = None,
+    timeout_seconds: float = 30,
+    amount: int = 20,
+    account: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Wait for inbox changes and return only the threads that changed and their new messages.
+
+    Call it first without a cursor to get a baseline, then keep calling it with the
+    returned cursor. Each call returns as soon as something changed, or with no
+    changes after timeout_seconds. The inbox is polled more often while it is busy
+    and less often while it is quiet, and concurrent watchers share each poll.
+
+    Args:
+        cursor: Cursor from the previous watch_inbox call (omit for the first call).
+        timeout_seconds: How long to wait for a change before returning (default 30, max 300).
+        amount: Number of most recent threads to watch (default 20).
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, the changed threads (each with its new messages),
+        the cursor for the next call and the current poll interval.
+    """
+    try:
+        target = accounts.get(account)
+        poller = _inbox_pollers.setdefault(target.username, InboxPoller(WATCH_MIN_INTERVAL, WATCH_MAX_INTERVAL))
+        amount = max(1, amount)
+        deadline = time.monotonic() + max(0.0, min(timeout_seconds, WATCH_MAX_TIMEOUT))
+
+        async def fetch(count: int):
+            threads = await _call("direct_threads", count, account=target.username)
+            await _remember_users(u for t in threads for u in t.users)
+            await asyncio.to_thread(message_store.note_threads, target.username, threads)
+            thread_cache.note_threads(target.username, threads)
+            return threads
+
+        seen = decode_snapshot(cursor) if cursor else None
+        while True:
+            threads = await poller.latest(fetch, amount)
+            changes = diff_inbox(seen[1], seen[0], threads) if seen else []
+            if seen is None or changes or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(max(0.1, min(poller.next_poll_in(), deadline - time.monotonic())))
+
+        viewer_id = target.client.user_id
+        return {
+            "success": True,
+            "baseline": seen is None,
+            "changed_threads": [
+                {
+                    "thread_id": thread.id,
+                    "thread_title": thread.thread_title,
+                    "users": [u.username for u in thread.users],
+                    "last_activity_at": thread.last_activity_at,
+                    "new_messages": [_watch_message(m, viewer_id) for m in new_messages],
+                    "more_new_messages": maybe_more,
+                }
+                for thread, new_messages, maybe_more in changes
+            ],
+            "cursor": encode_snapshot(threads, poller.taken_at),
+            "poll_interval_seconds": round(poller.interval, 1),
+        }
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+@mcp_tool()
+async def list_messages(thread_id: str, amount: int = 20, account: Optional[str] = None) -> Dict[str, Any]:
     """Get messages from a specific Instagram Direct Message thread by thread ID, with an optional limit.
 
     Args:
         thread_id: The thread ID to fetch messages from.
         amount: Number of messages to fetch (default 20).
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and the list of messages or error message.
     """
     if not thread_id:
         return {"success": False, "message": "Thread ID must be provided."}
     try:
-        messages = client.direct_messages(thread_id, amount)
-        result_msgs = []
-        for m in messages:
-            msg = m.dict() if hasattr(m, 'dict') else (m if isinstance(m, dict) else {})
-            # Expose item_type and shared post/reel info if present
-            item_type = getattr(m, 'item_type', None) or msg.get('item_type')
-            shared_info = None
-            shared_url = None
-            shared_code = None
-            if item_type in ["clip", "media_share", "reel_share", "xma_media_share", "post_share"]:
-                # Try to extract code/url from known attributes
-                clip = getattr(m, 'clip', None) or msg.get('clip')
-                media_share = getattr(m, 'media_share', None) or msg.get('media_share')
-                xma = getattr(m, 'xma_media_share', None) or msg.get('xma_media_share')
-                post_share = getattr(m, 'post_share', None) or msg.get('post_share')
-                # Try to get code/url from any of these
-                for obj in [clip, media_share, xma, post_share]:
-                    if obj:
-                        shared_code = obj.get('code') or obj.get('pk')
-                        shared_url = obj.get('url') or (f"https://www.instagram.com/reel/{shared_code}/" if shared_code else None)
-                        shared_info = obj
-                        break
-            msg['item_type'] = item_type
-            msg['shared_post_info'] = shared_info
-            msg['shared_post_url'] = shared_url
-            msg['shared_post_code'] = shared_code
-            result_msgs.append(msg)
-        return {"success": True, "messages": result_msgs}
+        await _sync_thread(thread_id, amount, account)
+        messages = await asyncio.to_thread(message_store.get_messages, _account_name(account), thread_id, amount)
+        return {"success": True, "messages": [serialize_message(m) for m in messages]}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def mark_message_seen(thread_id: str, message_id: str) -> Dict[str, Any]:
+@mcp_tool()
+async def mark_message_seen(thread_id: str, message_id: str, account: Optional[str] = None) -> Dict[str, Any]:
     """Mark a message as seen in a direct message thread.
 
     Args:
         thread_id: The thread ID containing the message.
         message_id: The ID of the message to mark as seen.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and a status message.
     """
@@ -225,7 +1261,8 @@ def mark_message_seen(thread_id: str, message_id: str) -> Dict[str, Any]:
         return {"success": False, "message": "Both thread_id and message_id must be provided."}
     
     try:
-        result = client.direct_message_seen(int(thread_id), int(message_id))
+        result = await _call("direct_message_seen", int(thread_id), int(message_id), account=account)
+        await _threads_changed(account, thread_id)
         if result:
             return {"success": True, "message": "Message marked as seen."}
         else:
@@ -234,90 +1271,163 @@ def mark_message_seen(thread_id: str, message_id: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def list_pending_chats(amount: int = 20) -> Dict[str, Any]:
+@mcp_tool()
+async def list_pending_chats(amount: int = 20, fields: Optional[List[str]] = None, account: Optional[str] = None) -> Dict[str, Any]:
     """Get Instagram Direct Message threads (chats) from the user's pending inbox.
 
     Args:
         amount: Number of pending threads to fetch (default 20).
+        fields: If provided, return only these fields for each thread (e.g. "id", "users.username", "messages[0].text").
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and the list of pending threads or error message.
     """
     try:
-        threads = client.direct_pending_inbox(amount)
+        threads = await _call("direct_pending_inbox", amount, account=account)
+        await _remember_users(u for t in threads for u in t.users)
+        if fields:
+            return {"success": True, "threads": [project(t, fields) for t in threads]}
         return {"success": True, "threads": [t.dict() if hasattr(t, 'dict') else str(t) for t in threads]}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def search_threads(query: str) -> Dict[str, Any]:
+@mcp_tool()
+async def search_threads(query: str, fields: Optional[List[str]] = None, account: Optional[str] = None) -> Dict[str, Any]:
     """Search Instagram Direct Message threads by username or keyword.
 
     Args:
         query: The search term (username or keyword).
+        fields: If provided, return only these fields for each result (e.g. "pk", "username").
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and the search results or error message.
     """
     if not query:
         return {"success": False, "message": "Query must be provided."}
     try:
-        results = client.direct_search(query)
+        results = await _call("direct_search", query, account=account)
+        await _remember_users(results)
+        if fields:
+            return {"success": True, "results": [project(r, fields) for r in results]}
         return {"success": True, "results": [r.dict() if hasattr(r, 'dict') else str(r) for r in results]}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_thread_by_participants(user_ids: List[int]) -> Dict[str, Any]:
+@mcp_tool()
+async def search_messages(
+    query: str,
+    thread_id: Optional[str] = None,
+    sender: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 20,
+    account: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Full-text search over the text of DM messages already synced locally (by list_messages, get_thread_details, etc.), without contacting Instagram.
+
+    Args:
+        query: Words to search for; every word must appear. End a word with * to match prefixes.
+        thread_id: Only search this thread.
+        sender: Only messages sent by this username or user ID.
+        since: Only messages at or after this ISO date/time (e.g. "2024-01-31").
+        until: Only messages before this ISO date/time.
+        limit: Maximum number of results (default 20).
+        account: Username of the logged-in account whose synced messages to search (default: the primary account).
+    Returns:
+        A dictionary with success status and ranked matches with highlighted snippets.
+    """
+    if not query:
+        return {"success": False, "message": "Query must be provided."}
+    try:
+        since_ts = datetime.fromisoformat(since).timestamp() if since else None
+        until_ts = datetime.fromisoformat(until).timestamp() if until else None
+        sender_id = None
+        if sender:
+            sender_id = sender if sender.isdigit() else await _resolve_user_id(sender, account)
+            if not sender_id:
+                return {"success": False, "message": f"User '{sender}' not found."}
+        results = await asyncio.to_thread(message_store.search, _account_name(account), query, thread_id, sender_id, since_ts, until_ts, limit)
+        return {"success": True, "results": results, "count": len(results)}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+@mcp_tool()
+async def get_thread_by_participants(user_ids: List[int], fields: Optional[List[str]] = None, account: Optional[str] = None) -> Dict[str, Any]:
     """Get an Instagram Direct Message thread by participant user IDs.
 
     Args:
-        user_ids: List of user IDs (ints).
+        user_ids: User IDs (ints) of the other participants.
+        fields: If provided, return only these fields of the thread (e.g. "id", "users.username", "messages.text").
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and the thread or error message.
     """
     if not user_ids or not isinstance(user_ids, list):
         return {"success": False, "message": "user_ids must be a non-empty list of user IDs."}
     try:
-        thread = client.direct_thread_by_participants(user_ids)
-        return {"success": True, "thread": thread.dict() if hasattr(thread, 'dict') else str(thread)}
+        viewer = _account_name(account)
+        thread_id = thread_cache.thread_for(viewer, user_ids)
+        if thread_id is not None:
+            thread = await _load_thread(thread_id, 20, account)
+        else:
+            thread, cursor = await _call(fetch_thread_by_participants, user_ids, account=account)
+            if thread is None:
+                return {"success": False, "message": "No thread with these participants."}
+            if await asyncio.to_thread(message_store.thread_state, viewer, str(thread.id)) is None:
+                await asyncio.to_thread(message_store.save_head, viewer, thread, [thread.messages], cursor, reset=True)
+            else:
+                await asyncio.to_thread(message_store.note_threads, viewer, [thread])
+            thread_cache.note_threads(viewer, [thread])
+        await _remember_users(thread.users)
+        if fields:
+            return {"success": True, "thread": project(thread, fields)}
+        return {"success": True, "thread": serialize_thread(thread)}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_thread_details(thread_id: str, amount: int = 20) -> Dict[str, Any]:
+@mcp_tool()
+async def get_thread_details(thread_id: str, amount: int = 20, fields: Optional[List[str]] = None, account: Optional[str] = None) -> Dict[str, Any]:
     """Get details and messages for a specific Instagram Direct Message thread by thread ID, with an optional message limit.
 
     Args:
         thread_id: The thread ID to fetch details for.
         amount: Number of messages to fetch (default 20).
+        fields: If provided, return only these fields of the thread (e.g. "thread_title", "users.username", "messages.text").
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and the thread details or error message.
     """
     if not thread_id:
         return {"success": False, "message": "Thread ID must be provided."}
     try:
-        thread = client.direct_thread(thread_id, amount)
-        return {"success": True, "thread": thread.dict() if hasattr(thread, 'dict') else str(thread)}
+        thread = await _load_thread(thread_id, amount, account)
+        await _remember_users(thread.users)
+        thread_cache.remember_participants(_account_name(account), thread)
+        if fields:
+            return {"success": True, "thread": project(thread, fields)}
+        return {"success": True, "thread": serialize_thread(thread)}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_id_from_username(username: str) -> Dict[str, Any]:
+@mcp_tool()
+async def get_user_id_from_username(username: str, account: Optional[str] = None) -> Dict[str, Any]:
     """Get the Instagram user ID for a given username.
 
     Args:
         username: Instagram username.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and the user ID or error message.
     """
     if not username:
         return {"success": False, "message": "Username must be provided."}
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = await _resolve_user_id(username, account)
         if user_id:
             return {"success": True, "user_id": user_id}
         else:
@@ -326,19 +1436,24 @@ def get_user_id_from_username(username: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
+@mcp_tool()
+async def get_username_from_user_id(user_id: str, account: Optional[str] = None) -> Dict[str, Any]:
     """Get the Instagram username for a given user ID.
 
     Args:
         user_id: Instagram user ID.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and the username or error message.
     """
     if not user_id:
         return {"success": False, "message": "User ID must be provided."}
     try:
-        username = client.username_from_user_id(user_id)
+        username = await asyncio.to_thread(user_id_cache.get_username, user_id)
+        if not username:
+            username = await _call("username_from_user_id", user_id, account=account)
+            if username:
+                await asyncio.to_thread(user_id_cache.set, username, user_id)
         if username:
             return {"success": True, "username": username}
         else:
@@ -347,103 +1462,140 @@ def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_info(username: str) -> Dict[str, Any]:
+@mcp_tool()
+async def get_user_info(username: str, max_age: Optional[float] = None, account: Optional[str] = None) -> Dict[str, Any]:
     """Get detailed information about an Instagram user.
 
+    Recently fetched profiles are answered from a local cache and refreshed in the
+    background; pass max_age to require data no older than that.
+
     Args:
         username: Instagram username to get information about.
+        max_age: Maximum age in seconds of cached data to accept (0 always fetches fresh data;
+            default: any cached profile within the cache's lifetime).
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
-        A dictionary with success status and user information.
+        A dictionary with success status, user information and the age of that information in seconds.
     """
     if not username:
         return {"success": False, "message": "Username must be provided."}
-    
+
+    async def fetch():
+        # Skip instagrapi's own per-client cache; profile_cache decides freshness
+        user = await _call("user_info_by_username", username, use_cache=False, account=account)
+        if not user:
+            return None
+        await _remember_users([user])
+        return {
+            "user_id": str(user.pk),
+            "username": user.username,
+            "full_name": user.full_name,
+            "biography": user.biography,
+            "follower_count": user.follower_count,
+            "following_count": user.following_count,
+            "media_count": user.media_count,
+            "is_private": user.is_private,
+            "is_verified": user.is_verified,
+            "profile_pic_url": str(user.profile_pic_url) if user.profile_pic_url else None,
+            "external_url": str(user.external_url) if user.external_url else None,
+            "category": user.category,
+        }
+
     try:
-        user = client.user_info_by_username(username)
-        if user:
-            user_data = {
-                "user_id": str(user.pk),
-                "username": user.username,
-                "full_name": user.full_name,
-                "biography": user.biography,
-                "follower_count": user.follower_count,
-                "following_count": user.following_count,
-                "media_count": user.media_count,
-                "is_private": user.is_private,
-                "is_verified": user.is_verified,
-                "profile_pic_url": str(user.profile_pic_url) if user.profile_pic_url else None,
-                "external_url": str(user.external_url) if user.external_url else None,
-                "category": user.category,
-            }
-            return {"success": True, "user_info": user_data}
+        user_data, age = await _cached_lookup(f"user:{username.lstrip('@').lower()}", fetch, max_age)
+        if user_data:
+            return {"success": True, "user_info": user_data, "age_seconds": round(age, 1)}
         else:
             return {"success": False, "message": f"User '{username}' not found."}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def check_user_online_status(usernames: List[str]) -> Dict[str, Any]:
+@mcp_tool()
+async def check_user_online_status(usernames: List[str], account: Optional[str] = None) -> Dict[str, Any]:
     """Check the online status of Instagram users.
 
     Args:
         usernames: List of Instagram usernames to check status for.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
-        A dictionary with success status and users' presence information.
+        A dictionary with success status, users' presence information and, under "failed",
+        the reason for each username whose presence could not be retrieved.
     """
     if not usernames or not isinstance(usernames, list):
         return {"success": False, "message": "A list of usernames must be provided."}
-    
+
     try:
-        user_ids = []
-        username_to_id = {}
-        
-        # Get user IDs for the usernames
-        for username in usernames:
-            try:
-                user_id = client.user_id_from_username(username)
-                if user_id:
-                    user_ids.append(int(user_id))
-                    username_to_id[user_id] = username
-            except:
+        viewer = accounts.get(account).username
+        names = list(dict.fromkeys(usernames))
+        resolved = await asyncio.gather(*(_resolve_user_id(name, account) for name in names), return_exceptions=True)
+        failed: Dict[str, str] = {}
+        username_to_id: Dict[str, str] = {}
+        for name, user_id in zip(names, resolved):
+            if isinstance(user_id, Exception):
+                failed[name] = f"Could not resolve username: {user_id}"
+            elif not user_id:
+                failed[name] = "User not found."
+            else:
+                username_to_id[name] = str(user_id)
+
+        now = time.monotonic()
+        presence: Dict[str, Any] = {}
+        for user_id in set(username_to_id.values()):
+            cached = _presence_cache.get((viewer, user_id))
+            if cached and cached[0] > now:
+                presence[user_id] = cached[1]
+        missing = sorted(set(username_to_id.values()) - presence.keys())
+        batches = [missing[i:i + PRESENCE_BATCH_SIZE] for i in range(0, len(missing), PRESENCE_BATCH_SIZE)]
+        responses = await asyncio.gather(
+            *(_call("direct_users_presence", [int(uid) for uid in batch], account=account) for batch in batches),
+            return_exceptions=True,
+        )
+        batch_errors: Dict[str, str] = {}
+        expires = time.monotonic() + PRESENCE_TTL
+        for batch, response in zip(batches, responses):
+            if isinstance(response, Exception):
+                batch_errors.update((uid, f"Presence request failed: {response}") for uid in batch)
                 continue
-        
-        if not user_ids:
-            return {"success": False, "message": "No valid users found."}
-        
-        presence_data = client.direct_users_presence(user_ids)
-        
-        # Convert back to usernames
+            for uid, data in response.get("user_presence", {}).items():
+                presence[str(uid)] = data
+                _presence_cache[(viewer, str(uid))] = (expires, data)
+        for key in [k for k, (expiry, _) in _presence_cache.items() if expiry <= now]:
+            del _presence_cache[key]
+
         result = {}
-        for user_id_str, presence in presence_data.items():
-            username = username_to_id.get(user_id_str, f"user_{user_id_str}")
-            result[username] = presence
-        
-        return {"success": True, "presence_data": result}
+        for name, user_id in username_to_id.items():
+            if user_id in presence:
+                result[name] = presence[user_id]
+            else:
+                failed[name] = batch_errors.get(user_id, "Instagram returned no presence for this user.")
+        if not result:
+            return {"success": False, "message": "No presence data could be retrieved.", "failed": failed}
+        return {"success": True, "presence_data": result, "failed": failed}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def search_users(query: str) -> Dict[str, Any]:
+@mcp_tool()
+async def search_users(query: str, max_age: Optional[float] = None, account: Optional[str] = None) -> Dict[str, Any]:
     """Search for Instagram users by name or username.
 
     Args:
         query: Search term (name or username).
-        count: Maximum number of users to return (default 10, max 50).
+        max_age: Maximum age in seconds of cached results to accept (0 always searches again;
+            default: any cached result within the cache's lifetime).
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
-        A dictionary with success status and search results.
+        A dictionary with success status, search results and the age of those results in seconds.
     """
     if not query:
         return {"success": False, "message": "Search query must be provided."}
-    
-    try:
-        users = client.search_users(query)
-        
-        user_results = []
-        for user in users:
-            user_data = {
+
+    async def fetch():
+        users = await _call("search_users", query, account=account)
+        await _remember_users(users)
+        return [
+            {
                 "user_id": str(user.pk),
                 "username": user.username,
                 "full_name": user.full_name,
@@ -451,19 +1603,23 @@ def search_users(query: str) -> Dict[str, Any]:
                 "profile_pic_url": str(user.profile_pic_url) if user.profile_pic_url else None,
                 "follower_count": getattr(user, 'follower_count', None),
             }
-            user_results.append(user_data)
-        
-        return {"success": True, "users": user_results, "count": len(user_results)}
+            for user in users
+        ]
+
+    try:
+        user_results, age = await _cached_lookup(f"search:{query.strip().lower()}", fetch, max_age)
+        return {"success": True, "users": user_results, "count": len(user_results), "age_seconds": round(age, 1)}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_stories(username: str) -> Dict[str, Any]:
+@mcp_tool()
+async def get_user_stories(username: str, account: Optional[str] = None) -> Dict[str, Any]:
     """Get Instagram stories from a user.
 
     Args:
         username: Instagram username to get stories from.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and stories information.
     """
@@ -471,11 +1627,11 @@ def get_user_stories(username: str) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
     
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = await _resolve_user_id(username, account)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
-        stories = client.user_stories(user_id)
+        stories = await _call("user_stories", user_id, account=account)
         
         story_results = []
         for story in stories:
@@ -502,13 +1658,14 @@ def get_user_stories(username: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def like_media(media_url: str, like: bool = True) -> Dict[str, Any]:
+@mcp_tool()
+async def like_media(media_url: str, like: bool = True, account: Optional[str] = None) -> Dict[str, Any]:
     """Like or unlike an Instagram post.
 
     Args:
         media_url: URL of the Instagram post.
         like: True to like, False to unlike the post.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and a status message.
     """
@@ -516,15 +1673,15 @@ def like_media(media_url: str, like: bool = True) -> Dict[str, Any]:
         return {"success": False, "message": "Media URL must be provided."}
     
     try:
-        media_pk = client.media_pk_from_url(media_url)
+        media_pk = _media_pk_from_url(media_url, account)
         if not media_pk:
             return {"success": False, "message": "Invalid media URL or post not found."}
         
         if like:
-            result = client.media_like(media_pk)
+            result = await _call("media_like", media_pk, account=account)
             action = "liked"
         else:
-            result = client.media_unlike(media_pk)
+            result = await _call("media_unlike", media_pk, account=account)
             action = "unliked"
         
         if result:
@@ -535,13 +1692,14 @@ def like_media(media_url: str, like: bool = True) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_followers(username: str, count: int = 20) -> Dict[str, Any]:
+@mcp_tool()
+async def get_user_followers(username: str, count: int = 20, account: Optional[str] = None) -> Dict[str, Any]:
     """Get followers of an Instagram user.
 
     Args:
         username: Instagram username to get followers for.
         count: Maximum number of followers to return (default 20).
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and followers list.
     """
@@ -549,11 +1707,12 @@ def get_user_followers(username: str, count: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
     
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = await _resolve_user_id(username, account)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
-        followers = client.user_followers(user_id, amount=count)
+        followers = await _call("user_followers", user_id, amount=count, account=account)
+        await _remember_users(followers.values())
         
         follower_results = []
         for follower_id, follower in followers.items():
@@ -571,13 +1730,14 @@ def get_user_followers(username: str, count: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_following(username: str, count: int = 20) -> Dict[str, Any]:
+@mcp_tool()
+async def get_user_following(username: str, count: int = 20, account: Optional[str] = None) -> Dict[str, Any]:
     """Get users that an Instagram user is following.
 
     Args:
         username: Instagram username to get following list for.
         count: Maximum number of following to return (default 20).
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and following list.
     """
@@ -585,11 +1745,12 @@ def get_user_following(username: str, count: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
     
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = await _resolve_user_id(username, account)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
-        following = client.user_following(user_id, amount=count)
+        following = await _call("user_following", user_id, amount=count, account=account)
+        await _remember_users(following.values())
         
         following_results = []
         for following_id, followed_user in following.items():
@@ -607,13 +1768,218 @@ def get_user_following(username: str, count: int = 20) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def get_user_posts(username: str, count: int = 12) -> Dict[str, Any]:
+# Private API chunk methods behind the paged follower/following tools
+FOLLOW_LIST_METHODS = {"followers": "user_followers_v1_chunk", "following": "user_following_v1_chunk"}
+FOLLOW_PAGE_MAX = 200
+
+
+def _encode_follow_cursor(kind: str, user_id: str, max_id: str) -> str:
+    payload = json.dumps({"k": kind, "u": str(user_id), "m": max_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_follow_cursor(token: str, kind: str) -> Dict[str, str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+    if payload.get("k") != kind:
+        raise ValueError(f"Cursor does not belong to a {kind} listing.")
+    return payload
+
+
+def _follow_user_data(user) -> Dict[str, Any]:
+    return {
+        "user_id": str(user.pk),
+        "username": user.username,
+        "full_name": user.full_name,
+        "is_private": user.is_private,
+        "profile_pic_url": str(user.profile_pic_url) if user.profile_pic_url else None,
+    }
+
+
+def _load_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    """A saved export checkpoint, or None if there is none or it cannot be read."""
+    try:
+        checkpoint = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable export checkpoint {path}: {str(e)}")
+        return None
+    return checkpoint if isinstance(checkpoint, dict) else None
+
+
+def _save_checkpoint(path: Path, checkpoint: Dict[str, Any]) -> None:
+    """Write a checkpoint so a crash leaves either the old or the new one, never a torn file."""
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w") as f:
+        f.write(json.dumps(checkpoint))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _append_lines(f, lines: List[bytes]) -> int:
+    """Append ``lines`` durably; returns the new end of the file."""
+    f.write(b"".join(lines))
+    f.flush()
+    os.fsync(f.fileno())
+    return f.tell()
+
+
+async def _fetch_follow_page(kind: str, username: str, cursor: Optional[str], page_size: int, account: Optional[str] = None):
+    """Fetch one page of a follower/following list.
+
+    Returns:
+        A ``(users, next_cursor)`` tuple; ``next_cursor`` is None on the last page.
+    """
+    if cursor:
+        payload = _decode_follow_cursor(cursor, kind)
+        user_id, max_id = payload["u"], payload["m"]
+    else:
+        user_id, max_id = await _resolve_user_id(username, account), ""
+        if not user_id:
+            raise ValueError(f"User '{username}' not found.")
+    page_size = max(1, min(page_size, FOLLOW_PAGE_MAX))
+    users, next_max_id = await _call(FOLLOW_LIST_METHODS[kind], user_id, page_size, max_id, account=account)
+    await _remember_users(users)
+    next_cursor = _encode_follow_cursor(kind, user_id, next_max_id) if next_max_id else None
+    return users, next_cursor
+
+
+async def _follow_page_tool(kind: str, username: str, cursor: Optional[str], page_size: int, account: Optional[str] = None) -> Dict[str, Any]:
+    if not username and not cursor:
+        return {"success": False, "message": "Username or cursor must be provided."}
+    try:
+        users, next_cursor = await _fetch_follow_page(kind, username, cursor, page_size, account)
+        results = [_follow_user_data(u) for u in users]
+        return {"success": True, kind: results, "count": len(results), "next_cursor": next_cursor}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+@mcp_tool()
+async def get_user_followers_page(username: str = "", cursor: Optional[str] = None, page_size: int = 50, account: Optional[str] = None) -> Dict[str, Any]:
+    """Get one page of an Instagram user's followers, for walking large lists.
+
+    Args:
+        username: Instagram username (only needed for the first page).
+        cursor: The next_cursor from the previous page; omit for the first page.
+        page_size: Followers per page (default 50, max 200).
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, the followers on this page and next_cursor (None on the last page).
+    """
+    return await _follow_page_tool("followers", username, cursor, page_size, account)
+
+
+@mcp_tool()
+async def get_user_following_page(username: str = "", cursor: Optional[str] = None, page_size: int = 50, account: Optional[str] = None) -> Dict[str, Any]:
+    """Get one page of the users an Instagram user is following, for walking large lists.
+
+    Args:
+        username: Instagram username (only needed for the first page).
+        cursor: The next_cursor from the previous page; omit for the first page.
+        page_size: Users per page (default 50, max 200).
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, the users on this page and next_cursor (None on the last page).
+    """
+    return await _follow_page_tool("following", username, cursor, page_size, account)
+
+
+@mcp_tool()
+async def export_user_follow_list(
+    username: str,
+    output_path: str,
+    kind: str = "followers",
+    page_size: int = 200,
+    max_pages: Optional[int] = None,
+    account: Optional[str] = None,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Stream a user's followers or following list into a JSONL file, one user per line.
+
+    Progress is checkpointed to "<output_path>.cursor.json" after every page. If the
+    export stops (error, rate limit or max_pages), calling it again with the same
+    output_path resumes where it left off.
+
+    Args:
+        username: Instagram username whose list to export.
+        output_path: Path of the JSONL file to write.
+        kind: "followers" or "following" (default "followers").
+        page_size: Users fetched per request (default 200, max 200).
+        max_pages: Stop after this many pages in this call (default: run to the end).
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, users exported so far and whether the export is complete.
+    """
+    if kind not in FOLLOW_LIST_METHODS:
+        return {"success": False, "message": f"kind must be one of {list(FOLLOW_LIST_METHODS)}."}
+    if not username or not output_path:
+        return {"success": False, "message": "Username and output_path must be provided."}
+    output = Path(output_path)
+    checkpoint_path = output.with_name(output.name + ".cursor.json")
+    checkpoint = {"username": username, "kind": kind, "cursor": None, "exported": 0, "offset": 0}
+    pages = 0
+    try:
+        saved = await asyncio.to_thread(_load_checkpoint, checkpoint_path)
+        # A checkpoint for another export, or one missing fields, means starting over
+        if saved and saved.get("username") == username and saved.get("kind") == kind and set(checkpoint) <= set(saved):
+            checkpoint = saved
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "a+b") as f:
+            # Drop anything written after the last checkpoint so a resumed page is not duplicated
+            await asyncio.to_thread(f.truncate, checkpoint["offset"])
+            while True:
+                users, next_cursor = await _fetch_follow_page(kind, username, checkpoint["cursor"], page_size, account)
+                lines = [json.dumps(_follow_user_data(u)).encode() + b"\n" for u in users]
+                offset = await asyncio.to_thread(_append_lines, f, lines)
+                pages += 1
+                checkpoint.update(cursor=next_cursor, exported=checkpoint["exported"] + len(users), offset=offset)
+                if not next_cursor:
+                    break
+                await asyncio.to_thread(_save_checkpoint, checkpoint_path, checkpoint)
+                if ctx is not None:
+                    try:
+                        await ctx.report_progress(checkpoint["exported"], None, f"{checkpoint['exported']} {kind} exported")
+                    except Exception:
+                        pass  # progress is best-effort; a failed notification must not stop the export
+                if max_pages and pages >= max_pages:
+                    return {
+                        "success": True,
+                        "message": f"Paused after {pages} pages; call again to resume.",
+                        "output_path": str(output),
+                        "exported": checkpoint["exported"],
+                        "complete": False,
+                    }
+        await asyncio.to_thread(checkpoint_path.unlink, missing_ok=True)
+        return {
+            "success": True,
+            "message": f"Exported {checkpoint['exported']} {kind}.",
+            "output_path": str(output),
+            "exported": checkpoint["exported"],
+            "complete": True,
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Export interrupted: {str(e)}. Call again to resume.",
+            "output_path": str(output),
+            "exported": checkpoint["exported"],
+            "complete": False,
+        }
+
+
+@mcp_tool()
+async def get_user_posts(username: str, count: int = 12, account: Optional[str] = None) -> Dict[str, Any]:
     """Get recent posts from an Instagram user.
 
     Args:
         username: Instagram username to get posts from.
         count: Maximum number of posts to return (default 12).
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and posts list.
     """
@@ -621,11 +1987,11 @@ def get_user_posts(username: str, count: int = 12) -> Dict[str, Any]:
         return {"success": False, "message": "Username must be provided."}
     
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = await _resolve_user_id(username, account)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         
-        medias = client.user_medias(user_id, amount=count)
+        medias = await _call("user_medias", user_id, amount=count, account=account)
         
         media_results = []
         for media in medias:
@@ -655,35 +2021,80 @@ def _ensure_download_directory(download_path: str) -> None:
     Path(download_path).mkdir(parents=True, exist_ok=True)
 
 
-def _download_single_media(media, download_path: str) -> str:
-    """Download a single media item and return the file path."""
+async def _download_single_media(media, download_path: str, account: Optional[str] = None) -> str:
+    """Download a single media item and return the file path.
+
+    Media uploaded straight into a DM (``DirectMedia``) has no media pk, so it
+    is fetched from its CDN URL instead.
+    """
     media_type = media.media_type
+    media_pk = getattr(media, "pk", None)
+    cache_key = f"media:{media_pk}" if media_pk is not None else f"direct:{media.id}"
+    cached = await asyncio.to_thread(download_cache.get, cache_key, download_path)
+    if cached:
+        return cached["paths"][0]
     if media_type == 1:  # Photo
-        return str(client.photo_download(media.pk, download_path))
+        if media_pk is None:
+            file_path = str(await _call("photo_download_by_url", str(media.thumbnail_url), f"direct_{media.id}", download_path, account=account))
+        else:
+            file_path = str(await _call("photo_download", media_pk, download_path, account=account))
     elif media_type == 2:  # Video
-        return str(client.video_download(media.pk, download_path))
+        if media_pk is None:
+            file_path = str(await _call("video_download_by_url", str(media.video_url), f"direct_{media.id}", download_path, account=account))
+        else:
+            file_path = str(await _call("video_download", media_pk, download_path, account=account))
     else:
         raise ValueError(f"Unsupported media type: {media_type}")
+    await asyncio.to_thread(download_cache.put, cache_key, [file_path], "photo" if media_type == 1 else "video")
+    return file_path
 
 
-def _find_message_in_thread(thread_id: str, message_id: str):
-    """Find a specific message in a thread."""
-    messages = client.direct_messages(thread_id, 100)
-    return next((m for m in messages if str(m.id) == message_id), None)
+async def _is_older_than_store(owner: str, thread_id: str, message_id: str) -> bool:
+    """Whether an item id sorts below the oldest stored message (item ids grow over time)."""
+    oldest = await asyncio.to_thread(message_store.oldest_item_id, owner, thread_id)
+    try:
+        return oldest is None or int(message_id) < int(oldest)
+    except ValueError:
+        return True
 
 
-@mcp.tool()
-def list_media_messages(thread_id: str, limit: int = 100) -> Dict[str, Any]:
+async def _find_message_in_thread(thread_id: str, message_id: str, account: Optional[str] = None):
+    """Find a specific message in a thread.
+
+    Messages already listed are answered from the local store. Otherwise the
+    thread is synced and older history is paged in until the message turns up.
+    """
+    owner = _account_name(account)
+    message = await asyncio.to_thread(message_store.get_message, owner, message_id, thread_id)
+    if message:
+        return message
+    await _sync_thread(thread_id, 0, account)
+    message = await asyncio.to_thread(message_store.get_message, owner, message_id, thread_id)
+    thread_id = str(thread_id)
+    async with _thread_sync_locks.setdefault((owner, thread_id), asyncio.Lock()):
+        pages = 0
+        while message is None and pages < FIND_MAX_PAGES and await _is_older_than_store(owner, thread_id, message_id):
+            if not await _fetch_older_page(thread_id, account):
+                break
+            pages += 1
+            message = await asyncio.to_thread(message_store.get_message, owner, message_id, thread_id)
+    return message
+
+
+@mcp_tool()
+async def list_media_messages(thread_id: str, limit: int = 100, account: Optional[str] = None) -> Dict[str, Any]:
     """List all messages containing media in an Instagram direct message thread.
     Args:
         thread_id: The ID of the thread to check for media messages
         limit: Maximum number of messages to check (default 100, max 200)
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary containing success status and list of all media messages found
     """
     try:
         limit = min(limit, 200)
-        messages = client.direct_messages(thread_id, limit)
+        await _sync_thread(thread_id, limit, account)
+        messages = await asyncio.to_thread(message_store.get_messages, _account_name(account), thread_id, limit)
         media_messages = []
         for message in messages:
             if message.media:
@@ -705,19 +2116,20 @@ def list_media_messages(thread_id: str, limit: int = 100) -> Dict[str, Any]:
             "message": f"Failed to list media messages: {str(e)}"
         }
 
-@mcp.tool()
-def download_media_from_message(message_id: str, thread_id: str, download_path: str = "./downloads") -> Dict[str, Any]:
+@mcp_tool()
+async def download_media_from_message(message_id: str, thread_id: str, download_path: str = "./downloads", account: Optional[str] = None) -> Dict[str, Any]:
     """Download media from a specific Instagram direct message and get the local file path.
     Args:
         message_id: The ID of the message containing the media
         thread_id: The ID of the thread containing the message
         download_path: Directory to save the downloaded file (default: ./downloads)
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary containing success status, a status message, and the file path if successful
     """
     try:
         _ensure_download_directory(download_path)
-        target_message = _find_message_in_thread(thread_id, message_id)
+        target_message = await _find_message_in_thread(thread_id, message_id, account)
         if not target_message:
             return {
                 "success": False,
@@ -728,7 +2140,7 @@ def download_media_from_message(message_id: str, thread_id: str, download_path:
                 "success": False,
                 "message": "This message does not contain media"
             }
-        file_path = _download_single_media(target_message.media, download_path)
+        file_path = await _download_single_media(target_message.media, download_path, account)
         return {
             "success": True,
             "message": "Media downloaded successfully",
@@ -744,58 +2156,60 @@ def download_media_from_message(message_id: str, thread_id: str, download_path:
         }
 
 
-@mcp.tool()
-def download_shared_post_from_message(message_id: str, thread_id: str, download_path: str = "./downloads") -> Dict[str, Any]:
+@mcp_tool()
+async def download_shared_post_from_message(message_id: str, thread_id: str, download_path: str = "./downloads", account: Optional[str] = None) -> Dict[str, Any]:
     """Download media from a shared post/reel/clip in a DM message and get the local file path.
     Args:
         message_id: The ID of the message containing the shared post/reel/clip
         thread_id: The ID of the thread containing the message
         download_path: Directory to save the downloaded file (default: ./downloads)
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary containing success status, a status message, and the file path if successful
     """
     try:
         _ensure_download_directory(download_path)
-        target_message = _find_message_in_thread(thread_id, message_id)
+        target_message = await _find_message_in_thread(thread_id, message_id, account)
         if not target_message:
             return {"success": False, "message": f"Message {message_id} not found in thread {thread_id}"}
-        item_type = getattr(target_message, 'item_type', None)
-        # Extract shared post/reel/clip URL
-        shared_url = None
-        shared_code = None
-        shared_obj = None
-        if item_type in ["clip", "media_share", "reel_share", "xma_media_share", "post_share"]:
-            for attr in ['clip', 'media_share', 'xma_media_share', 'post_share']:
-                obj = getattr(target_message, attr, None)
-                if obj:
-                    shared_code = obj.get('code') or obj.get('pk')
-                    shared_url = obj.get('url') or (f"https://www.instagram.com/reel/{shared_code}/" if shared_code else None)
-                    shared_obj = obj
-                    break
-        if not shared_url:
+        # Same extraction as list_messages: shared posts and reels carry the Media pk, XMA shares only a URL
+        record = serialize_message(target_message)
+        shared_url, shared_info = record["shared_post_url"], record["shared_post_info"] or {}
+        if not shared_url and not shared_info.get("pk"):
             return {"success": False, "message": "This message does not contain a supported shared post/reel/clip"}
         # Download using Instagrapi
         try:
-            media_pk = client.media_pk_from_url(shared_url)
-            media = client.media_info(media_pk)
-            if media.media_type == 1:
-                file_path = str(client.photo_download(media_pk, download_path))
-                media_type = "photo"
-            elif media.media_type == 2:
-                file_path = str(client.video_download(media_pk, download_path))
-                media_type = "video"
-            elif media.media_type == 8:  # album
-                # Download all items in album
-                album_paths = client.album_download(media_pk, download_path)
-                file_path = str(album_paths)
-                media_type = "album"
+            media_pk = str(shared_info["pk"]) if shared_info.get("pk") else _media_pk_from_url(shared_url, account)
+            cache_key = f"media:{media_pk}"
+            cached = await asyncio.to_thread(download_cache.get, cache_key, download_path)
+            if cached:
+                media_type = cached["media_type"]
+                paths = [Path(p) for p in cached["paths"]]
+                file_path = str(paths) if media_type == "album" else str(paths[0])
             else:
-                return {"success": False, "message": f"Unsupported media type: {media.media_type}"}
+                media = await _call("media_info", media_pk, account=account)
+                if media.media_type == 1:
+                    paths = [await _call("photo_download", media_pk, download_path, account=account)]
+                    file_path = str(paths[0])
+                    media_type = "photo"
+                elif media.media_type == 2:
+                    paths = [await _call("video_download", media_pk, download_path, account=account)]
+                    file_path = str(paths[0])
+                    media_type = "video"
+                elif media.media_type == 8:  # album
+                    # Download all items in album
+                    paths = await _call("album_download", media_pk, download_path, account=account)
+                    file_path = str(paths)
+                    media_type = "album"
+                else:
+                    return {"success": False, "message": f"Unsupported media type: {media.media_type}"}
+                await asyncio.to_thread(download_cache.put, cache_key, paths, media_type)
             return {
                 "success": True,
                 "message": "Shared post/reel/clip downloaded successfully",
                 "file_path": file_path,
                 "media_type": media_type,
+                "cached": bool(cached),
                 "shared_post_url": shared_url,
                 "message_id": message_id,
                 "thread_id": thread_id
@@ -806,13 +2220,127 @@ def download_shared_post_from_message(message_id: str, thread_id: str, download_
         return {"success": False, "message": f"Failed to process message: {str(e)}"}
 
 
-@mcp.tool()
-def delete_message(thread_id: str, message_id: str) -> Dict[str, Any]:
+@mcp_tool()
+async def download_thread_media(
+    thread_id: str,
+    download_path: str = "./downloads",
+    limit: int = 200,
+    media_types: Optional[List[str]] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    max_concurrency: Optional[int] = None,
+    max_per_second: Optional[float] = None,
+    account: Optional[str] = None,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """Download every direct-uploaded photo/video in a thread in parallel and return a manifest of local paths.
+    Args:
+        thread_id: The ID of the thread to archive
+        download_path: Directory to save the downloaded files (default: ./downloads)
+        limit: Maximum number of recent messages to scan (default 200)
+        media_types: Only download these types ("photo", "video"); default both
+        since: Only messages at or after this ISO date/time (e.g. "2024-01-31")
+        until: Only messages before this ISO date/time
+        max_concurrency: Downloads in flight at once (default INSTAGRAM_DOWNLOAD_CONCURRENCY or 4)
+        max_per_second: Maximum downloads started per second (default INSTAGRAM_DOWNLOADS_PER_SECOND or 2)
+        account: Username of the logged-in account to act as (default: the primary account).
+    Returns:
+        A dictionary with success status, counts, the manifest of downloaded files and any failures
+    """
+    if not thread_id:
+        return {"success": False, "message": "Thread ID must be provided."}
+    try:
+        since_ts = datetime.fromisoformat(since).timestamp() if since else None
+        until_ts = datetime.fromisoformat(until).timestamp() if until else None
+    except ValueError as e:
+        return {"success": False, "message": f"Invalid date filter: {e}"}
+    type_codes = {"photo": 1, "video": 2}
+    wanted = {type_codes[t] for t in (media_types or type_codes) if t in type_codes}
+    try:
+        _ensure_download_directory(download_path)
+        await _sync_thread(thread_id, limit, account)
+        targets = []
+        for message in await asyncio.to_thread(message_store.get_messages, _account_name(account), thread_id, limit):
+            if not message.media or message.media.media_type not in wanted:
+                continue
+            ts = message.timestamp.timestamp()
+            if (since_ts is not None and ts < since_ts) or (until_ts is not None and ts >= until_ts):
+                continue
+            targets.append(message)
+
+        semaphore = asyncio.Semaphore(max_concurrency or DOWNLOAD_CONCURRENCY)
+        interval = 1.0 / (max_per_second or DOWNLOADS_PER_SECOND)
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+        manifest, failures, done = [], [], 0
+
+        async def download(message):
+            nonlocal next_start, done
+            async with semaphore:
+                now = loop.time()
+                start, next_start = max(now, next_start), max(now, next_start) + interval
+                await asyncio.sleep(start - now)
+                try:
+                    file_path = await _download_single_media(message.media, download_path, account)
+                    manifest.append({
+                        "message_id": str(message.id),
+                        "media_type": "photo" if message.media.media_type == 1 else "video",
+                        "timestamp": str(message.timestamp),
+                        "sender_user_id": message.user_id,
+                        "file_path": file_path,
+                    })
+                except Exception as e:
+                    failures.append({"message_id": str(message.id), "error": str(e)})
+                done += 1
+                if ctx is not None:
+                    try:
+                        await ctx.report_progress(done, len(targets))
+                    except Exception:
+                        pass  # progress is best-effort; a failed notification must not abort the other downloads
+
+        await asyncio.gather(*(download(m) for m in targets))
+        manifest.sort(key=lambda item: item["timestamp"])
+        manifest_path = Path(download_path) / f"manifest_{thread_id}.json"
+        manifest_path.write_text(json.dumps({"thread_id": thread_id, "files": manifest, "failures": failures}, indent=2))
+        return {
+            "success": True,
+            "message": f"Downloaded {len(manifest)} of {len(targets)} media items",
+            "manifest_path": str(manifest_path),
+            "files": manifest,
+            "failures": failures,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"Failed to download thread media: {str(e)}"}
+
+
+@mcp_tool()
+async def get_rate_limit_status() -> Dict[str, Any]:
+    """Show the server's Instagram rate limits: queued calls, available tokens and any throttling pause per endpoint class.
+
+    Returns:
+        A dictionary with success status and, for each logged-in account, the state of each limit (read, send, upload, search).
+    """
+    return {"success": True, "accounts": {account.username: account.rate_limiter.stats() for account in accounts}}
+
+
+@mcp_tool()
+async def list_accounts() -> Dict[str, Any]:
+    """List the Instagram accounts this server is logged in as.
+
+    Returns:
+        A dictionary with success status and the account usernames; the first one is the default for every tool.
+    """
+    return {"success": True, "accounts": [account.username for account in accounts]}
+
+
+@mcp_tool()
+async def delete_message(thread_id: str, message_id: str, account: Optional[str] = None) -> Dict[str, Any]:
     """Delete a message from a direct message thread.
 
     Args:
         thread_id: The thread ID containing the message.
         message_id: The ID of the message to delete.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and a status message.
     """
@@ -820,8 +2348,11 @@ def delete_message(thread_id: str, message_id: str) -> Dict[str, Any]:
         return {"success": False, "message": "Both thread_id and message_id must be provided."}
     
     try:
-        result = client.direct_message_delete(int(thread_id), int(message_id))
+        result = await _call("direct_message_delete", int(thread_id), int(message_id), account=account)
         if result:
+            viewer = _account_name(account)
+            await asyncio.to_thread(message_store.delete_message, viewer, message_id)
+            thread_cache.invalidate(viewer, thread_id)
             return {"success": True, "message": "Message deleted successfully."}
         else:
             return {"success": False, "message": "Failed to delete message."}
@@ -829,13 +2360,14 @@ def delete_message(thread_id: str, message_id: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp.tool()
-def mute_conversation(thread_id: str, mute: bool = True) -> Dict[str, Any]:
+@mcp_tool()
+async def mute_conversation(thread_id: str, mute: bool = True, account: Optional[str] = None) -> Dict[str, Any]:
     """Mute or unmute a direct message conversation.
 
     Args:
         thread_id: The thread ID to mute/unmute.
         mute: True to mute, False to unmute the conversation.
+        account: Username of the logged-in account to act as (default: the primary account).
     Returns:
         A dictionary with success status and a status message.
     """
@@ -844,11 +2376,12 @@ def mute_conversation(thread_id: str, mute: bool = True) -> Dict[str, Any]:
     
     try:
         if mute:
-            result = client.direct_thread_mute(int(thread_id))
+            result = await _call("direct_thread_mute", int(thread_id), account=account)
             action = "muted"
         else:
-            result = client.direct_thread_unmute(int(thread_id))
+            result = await _call("direct_thread_unmute", int(thread_id), account=account)
             action = "unmuted"
+        await _threads_changed(account, thread_id)
         
         if result:
             return {"success": True, "message": f"Conversation {action} successfully."}
@@ -858,10 +2391,48 @@ def mute_conversation(thread_id: str, mute: bool = True) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
+def _shutdown() -> None:
+    """Let in-flight Instagram calls finish, then flush and close the local stores."""
+    logger.info("Shutting down")
+    for account in accounts:
+        account.worker_pool.shutdown(wait=True)
+    photo_preprocessor.shutdown()
+    download_cache.flush()
+    message_store.close()
+    user_id_cache.close()
+    send_queue.close()
+
+
+def _profile_startup(account: Account) -> Dict[str, Any]:
+    """Time each startup step for ``account``, in seconds."""
+    timings = {}
+    started = time.perf_counter()
+    import instagrapi
+    timings["import_instagrapi"] = time.perf_counter() - started
+    started = time.perf_counter()
+    account.prepare()
+    timings["session_load"] = time.perf_counter() - started
+    timings["session_file_found"] = account.session_file.exists()
+    started = time.perf_counter()
+    account.ensure_logged_in()
+    timings["login"] = time.perf_counter() - started
+    started = time.perf_counter()
+    account.worker_pool.run_sync("account_info")
+    timings["first_request"] = time.perf_counter() - started
+    return timings
+
+
 if __name__ == "__main__":
    parser = argparse.ArgumentParser()
    parser.add_argument("--username", type=str, help="Instagram username (can also be set via INSTAGRAM_USERNAME env var)")
    parser.add_argument("--password", type=str, help="Instagram password (can also be set via INSTAGRAM_PASSWORD env var)")
+   parser.add_argument("--max-workers", type=int, help="Number of concurrent Instagram requests per account (can also be set via INSTAGRAM_MAX_WORKERS env var, default 4)")
+   parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default=os.getenv("INSTAGRAM_MCP_TRANSPORT", "stdio"), help="How MCP clients connect: stdio (one client, the default) or sse/streamable-http (many clients share this process) (can also be set via INSTAGRAM_MCP_TRANSPORT env var)")
+   parser.add_argument("--host", type=str, default=os.getenv("INSTAGRAM_MCP_HOST", "127.0.0.1"), help="Address to listen on for sse/streamable-http (can also be set via INSTAGRAM_MCP_HOST env var, default 127.0.0.1)")
+   parser.add_argument("--port", type=int, default=int(os.getenv("INSTAGRAM_MCP_PORT", 8000)), help="Port to listen on for sse/streamable-http (can also be set via INSTAGRAM_MCP_PORT env var, default 8000)")
+   parser.add_argument("--max-concurrent-requests", type=int, help="Tool calls that may run at once across all clients; the rest wait (can also be set via INSTAGRAM_MAX_CONCURRENT_REQUESTS env var, default 32)")
+   parser.add_argument("--profile-startup", action="store_true", help="Time instagrapi import, session load, login and a first request for the primary account, print them as JSON and exit")
+   parser.add_argument("--account", action="append", metavar="USERNAME:PASSWORD", help="Additional Instagram account to log in; repeatable (can also be set via INSTAGRAM_ACCOUNTS env var as a comma-separated list)")
    args = parser.parse_args()
 
    # Get credentials from environment variables or command line arguments
@@ -876,27 +2447,49 @@ if __name__ == "__main__":
        print("2. Use --username and --password command line arguments")
        exit(1)
 
+   if args.max_workers:
+       MAX_WORKERS = args.max_workers
+   if args.max_concurrent_requests:
+       MAX_CONCURRENT_REQUESTS = args.max_concurrent_requests
+       _request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+   # Extra accounts share the load of account-independent reads and can be
+   # picked per tool call with the `account` argument
+   extra_accounts = [a for a in os.getenv("INSTAGRAM_ACCOUNTS", "").split(",") if a.strip()] + (args.account or [])
+
+   # CRITICAL FIX: Session file handling for persistent authentication
+   # Without this, Instagram login hangs due to rate limiting and security measures
+   # Session files allow Instagram to recognize the client and avoid fresh authentication
+   # This prevents the MCP server from hanging after "🚀 Attempting to send DM"
+   # Each account reuses and refreshes its own {username}_session.json. Login
+   # happens on the first tool call, so the MCP handshake never waits for it.
+   primary = _add_account(username, password)
+   for entry in extra_accounts:
+       extra_username, _, extra_password = entry.strip().partition(":")
+       _add_account(extra_username, extra_password)
+
+   if args.profile_startup:
+       timings = _profile_startup(primary)
+       print(json.dumps(timings, indent=2))
+       exit(0)
+
+   # Import instagrapi and load the session files while the client connects
+   threading.Thread(target=lambda: [account.prepare() for account in accounts], daemon=True).start()
+   if args.transport == "stdio":
+       logger.info("Serving over stdio; Instagram login happens on the first tool call")
+       # Turn SIGTERM into a normal exit so the cleanup below still runs
+       signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+   else:
+       mcp.settings.host = args.host
+       mcp.settings.port = args.port
+       path = mcp.settings.sse_path if args.transport == "sse" else mcp.settings.streamable_http_path
+       logger.info(f"Serving {args.transport} on http://{args.host}:{args.port}{path} (Prometheus metrics on /metrics); Instagram login happens on the first tool call")
+       if args.host not in ("127.0.0.1", "localhost", "::1"):
+           logger.warning(f"Listening on {args.host}: anyone who can reach this port can act as the logged-in Instagram account")
    try:
-       logger.info("Attempting to login to Instagram...")
-       
-       # CRITICAL FIX: Session file handling for persistent authentication
-       # Without this, Instagram login hangs due to rate limiting and security measures
-       # Session files allow Instagram to recognize the client and avoid fresh authentication
-       # This prevents the MCP server from hanging after "🚀 Attempting to send DM"
-       SESSION_FILE = Path(f"{username}_session.json")
-       if SESSION_FILE.exists():
-           logger.info(f"Loading existing session from {SESSION_FILE}")
-           client.load_settings(SESSION_FILE)
-       
-       client.login(username, password)
-       
-       # Save session for future use to avoid repeated fresh authentication
-       client.dump_settings(SESSION_FILE)
-       logger.info(f"Session saved to {SESSION_FILE}")
-       
-       logger.info("Successfully logged in to Instagram")
-       mcp.run(transport="stdio")
-   except Exception as e:
-       logger.error(f"Failed to login to Instagram: {str(e)}")
-       print(f"Error: Failed to login to Instagram - {str(e)}")
-       exit(1)
+       mcp.run(transport=args.transport)
+   except (KeyboardInterrupt, asyncio.CancelledError):
+       # Ctrl+C; uvicorn has already drained open HTTP requests
+       pass
+   finally:
+       _shutdown()
@@ -0,0 +1,407 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Bumped when the tables change incompatibly; older tables are dropped and refilled from Instagram
+SCHEMA_VERSION = 1
+
+
+def _epoch(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def fetch_thread_page(client, thread_id: str, cursor: Optional[str] = None, limit: int = 20):
+    """Fetch one page of a thread, newest first, like ``Client.direct_thread`` does.
+
+    Returns:
+        A ``(DirectThread, older_cursor)`` tuple. ``older_cursor`` is None once
+        the start of the conversation has been reached.
+    """
+    from instagrapi.exceptions import ClientNotFoundError, DirectThreadNotFound
+    from instagrapi.extractors import extract_direct_thread
+
+    params = {
+        "visual_message_return_type": "unseen",
+        "direction": "older",
+        "seq_id": "40065",
+        "limit": str(limit),
+    }
+    if cursor:
+        params["cursor"] = cursor
+    try:
+        result = client.private_request(f"direct_v2/threads/{thread_id}/", params=params)
+    except ClientNotFoundError as e:
+        raise DirectThreadNotFound(e, thread_id=thread_id, **client.last_json)
+    thread = result["thread"]
+    older_cursor = thread.get("oldest_cursor") if thread.get("has_older", True) else None
+    return extract_direct_thread(thread), older_cursor
+
+
+def fetch_thread_by_participants(client, user_ids: List[int]) -> Tuple[Optional[Any], Optional[str]]:
+    """The thread with exactly these other participants, like ``Client.direct_thread_by_participants``.
+
+    Returns:
+        A ``(DirectThread, older_cursor)`` tuple like ``fetch_thread_page`` for
+        its newest page, or ``(None, None)`` if there is no such thread.
+    """
+    from instagrapi.extractors import extract_direct_thread
+
+    result = client.private_request(
+        "direct_v2/threads/get_by_participants/",
+        params={"recipient_users": json.dumps([int(uid) for uid in user_ids]), "seq_id": 2580572, "limit": 20},
+    )
+    thread = result.get("thread")
+    if not thread:
+        return None, None
+    older_cursor = thread.get("oldest_cursor") if thread.get("has_older", True) else None
+    return extract_direct_thread(thread), older_cursor
+
+
+class MessageStore:
+    """Local SQLite (WAL) copy of DM threads and their messages.
+
+    For every thread it keeps the newest stored item id (the head), the cursor
+    to continue fetching older history from (the tail), the ``last_activity_at``
+    Instagram last reported, and the activity timestamp the stored copy is
+    current up to. Messages are stored as JSON dumps of instagrapi models so
+    reads can hand back ``DirectMessage``/``DirectThread`` objects.
+
+    Message text is indexed in an FTS5 table kept current by triggers, so
+    ``search`` covers every message as soon as it has been synced.
+
+    Every row belongs to the logged-in account (by username) it was fetched
+    as, and every method is scoped to one account: the same thread seen by two
+    accounts is stored twice, and one account never reads another's messages.
+    """
+
+    def __init__(self, db_path: Path):
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Stored before rows were scoped to an account; it is only a cache, so start over
+            self._db.executescript(
+                """
+                DROP TABLE IF EXISTS messages_fts;
+                DROP TABLE IF EXISTS messages;
+                DROP TABLE IF EXISTS threads;
+                """
+            )
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS threads (
+                account TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                last_activity_at REAL,
+                activity_checked_at REAL,
+                synced_activity_at REAL,
+                newest_item_id TEXT,
+                oldest_cursor TEXT,
+                history_complete INTEGER NOT NULL DEFAULT 0,
+                data TEXT,
+                PRIMARY KEY (account, thread_id)
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                user_id TEXT,
+                item_type TEXT,
+                text TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (account, item_id)
+            );
+            CREATE INDEX IF NOT EXISTS messages_thread_time
+                ON messages (account, thread_id, timestamp DESC);
+            """
+        )
+        has_fts = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+        ).fetchone()
+        self._db.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                text, content='messages', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF text ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+                INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+            END;
+            """
+        )
+        if not has_fts:
+            # Index messages stored before full-text search existed
+            self._db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        self._db.commit()
+
+    def thread_state(self, account: str, thread_id: str) -> Optional[Dict[str, Any]]:
+        """Sync bookkeeping for a thread, or None if it has never been synced."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_activity_at, activity_checked_at, synced_activity_at, newest_item_id,"
+                " oldest_cursor, history_complete,"
+                " (SELECT COUNT(*) FROM messages"
+                "  WHERE messages.account = threads.account AND messages.thread_id = threads.thread_id)"
+                " FROM threads WHERE account = ? AND thread_id = ?",
+                (account, str(thread_id)),
+            ).fetchone()
+        if row is None or row[3] is None:
+            return None
+        return {
+            "last_activity_at": row[0],
+            "activity_checked_at": row[1],
+            "synced_activity_at": row[2],
+            "newest_item_id": row[3],
+            "oldest_cursor": row[4],
+            "history_complete": bool(row[5]),
+            "message_count": row[6],
+        }
+
+    def _upsert_messages(self, account: str, thread_id: str, messages: Iterable[Any]) -> None:
+        rows = [
+            (
+                account,
+                str(m.id),
+                thread_id,
+                _epoch(m.timestamp),
+                str(m.user_id) if m.user_id is not None else None,
+                m.item_type,
+                m.text,
+                m.model_dump_json(),
+            )
+            for m in messages
+        ]
+        self._db.executemany(
+            "INSERT INTO messages (account, item_id, thread_id, timestamp, user_id, item_type, text, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(account, item_id) DO UPDATE SET thread_id = excluded.thread_id,"
+            " timestamp = excluded.timestamp, user_id = excluded.user_id,"
+            " item_type = excluded.item_type, text = excluded.text, data = excluded.data",
+            rows,
+        )
+
+    def note_threads(self, account: str, threads: Iterable[Any]) -> None:
+        """Record what an inbox listing (``direct_threads``) says about each thread.
+
+        Updates the last known activity and, when the listing's preview messages
+        reach back to the stored head, appends them so the stored copy stays
+        current without a separate thread fetch.
+        """
+        now = time.time()
+        with self._lock:
+            for thread in threads:
+                thread_id = str(thread.id)
+                activity = _epoch(thread.last_activity_at)
+                row = self._db.execute(
+                    "SELECT newest_item_id FROM threads WHERE account = ? AND thread_id = ?", (account, thread_id)
+                ).fetchone()
+                self._db.execute(
+                    "INSERT INTO threads (account, thread_id, last_activity_at, activity_checked_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(account, thread_id) DO UPDATE SET"
+                    " last_activity_at = excluded.last_activity_at,"
+                    " activity_checked_at = excluded.activity_checked_at",
+                    (account, thread_id, activity, now),
+                )
+                newest = row[0] if row else None
+                ids = [str(m.id) for m in thread.messages]
+                if newest is not None and newest in ids:
+                    newer = thread.messages[: ids.index(newest)]
+                    self._upsert_messages(account, thread_id, newer)
+                    self._db.execute(
+                        "UPDATE threads SET newest_item_id = ?, synced_activity_at = ? WHERE account = ? AND thread_id = ?",
+                        (ids[0], activity, account, thread_id),
+                    )
+            self._db.commit()
+
+    def save_head(self, account: str, thread: Any, pages: List[Any], older_cursor: Optional[str], reset: bool) -> None:
+        """Store the newest pages of a thread.
+
+        Args:
+            thread: The DirectThread from the newest page (metadata source).
+            pages: Message lists, newest page first.
+            older_cursor: Cursor below the last page; only used when ``reset``.
+            reset: True when the pages do not connect to stored history, in
+                which case stored messages are dropped and the tail restarts
+                from ``older_cursor``.
+        """
+        thread_id = str(thread.id)
+        messages = [m for page in pages for m in page]
+        data = thread.model_dump_json(exclude={"messages"})
+        activity = _epoch(thread.last_activity_at)
+        now = time.time()
+        with self._lock:
+            if reset:
+                self._db.execute("DELETE FROM messages WHERE account = ? AND thread_id = ?", (account, thread_id))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO threads (account, thread_id, oldest_cursor, history_complete) VALUES (?, ?, ?, ?)",
+                    (account, thread_id, older_cursor, int(older_cursor is None)),
+                )
+            self._upsert_messages(account, thread_id, messages)
+            newest = str(messages[0].id) if messages else None
+            self._db.execute(
+                "UPDATE threads SET last_activity_at = ?, activity_checked_at = ?, synced_activity_at = ?,"
+                " newest_item_id = COALESCE(?, newest_item_id, ''), data = ? WHERE account = ? AND thread_id = ?",
+                (activity, now, activity, newest, data, account, thread_id),
+            )
+            self._db.commit()
+
+    def save_tail(self, account: str, thread_id: str, messages: Iterable[Any], older_cursor: Optional[str]) -> None:
+        """Store an older page of history and advance the tail cursor."""
+        thread_id = str(thread_id)
+        with self._lock:
+            self._upsert_messages(account, thread_id, messages)
+            self._db.execute(
+                "UPDATE threads SET oldest_cursor = ?, history_complete = ? WHERE account = ? AND thread_id = ?",
+                (older_cursor, int(older_cursor is None), account, thread_id),
+            )
+            self._db.commit()
+
+    def get_messages(self, account: str, thread_id: str, amount: int = 20) -> List[Any]:
+        """Return up to ``amount`` stored messages of a thread, newest first."""
+        from instagrapi.types import DirectMessage
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM messages WHERE account = ? AND thread_id = ?"
+                " ORDER BY timestamp DESC, item_id DESC LIMIT ?",
+                (account, str(thread_id), amount),
+            ).fetchall()
+        return [DirectMessage.model_validate_json(row[0]) for row in rows]
+
+    def get_message(self, account: str, item_id: str, thread_id: Optional[str] = None) -> Optional[Any]:
+        """Look up a stored message by item id."""
+        from instagrapi.types import DirectMessage
+
+        query = "SELECT data FROM messages WHERE account = ? AND item_id = ?"
+        params: Tuple[str, ...] = (account, str(item_id))
+        if thread_id is not None:
+            query += " AND thread_id = ?"
+            params += (str(thread_id),)
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        return DirectMessage.model_validate_json(row[0]) if row else None
+
+    def oldest_item_id(self, account: str, thread_id: str) -> Optional[str]:
+        """Item id of the oldest stored message of a thread."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT item_id FROM messages WHERE account = ? AND thread_id = ?"
+                " ORDER BY timestamp ASC, item_id ASC LIMIT 1",
+                (account, str(thread_id)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_thread(self, account: str, thread_id: str, amount: int = 20) -> Optional[Any]:
+        """Rebuild a DirectThread from stored metadata and its newest messages."""
+        from instagrapi.types import DirectThread
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM threads WHERE account = ? AND thread_id = ?", (account, str(thread_id))
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        data = json.loads(row[0])
+        data["messages"] = self.get_messages(account, thread_id, amount)
+        return DirectThread.model_validate(data)
+
+    def search(
+        self,
+        account: str,
+        query: str,
+        thread_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Full-text search over the message text stored for ``account``, best matches first.
+
+        Each whitespace-separated term must appear (terms are matched as
+        quoted FTS5 strings; a trailing ``*`` makes a term a prefix match).
+        """
+        terms = []
+        for term in query.split():
+            prefix = term.endswith("*")
+            term = term.rstrip("*").replace('"', '""')
+            if term:
+                terms.append(f'"{term}"' + ("*" if prefix else ""))
+        if not terms:
+            return []
+        sql = (
+            "SELECT m.item_id, m.thread_id, json_extract(t.data, '$.thread_title'), m.user_id,"
+            " m.timestamp, m.item_type, m.text,"
+            " snippet(messages_fts, 0, '[', ']', '...', 12), bm25(messages_fts)"
+            " FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid"
+            " LEFT JOIN threads t ON t.account = m.account AND t.thread_id = m.thread_id"
+            " WHERE messages_fts MATCH ? AND m.account = ?"
+        )
+        params: List[Any] = [" ".join(terms), account]
+        filters = (
+            (" AND m.thread_id = ?", None if thread_id is None else str(thread_id)),
+            (" AND m.user_id = ?", None if user_id is None else str(user_id)),
+            (" AND m.timestamp >= ?", since),
+            (" AND m.timestamp < ?", until),
+        )
+        for clause, value in filters:
+            if value is not None:
+                sql += clause
+                params.append(value)
+        sql += " ORDER BY bm25(messages_fts) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [
+            {
+                "message_id": row[0],
+                "thread_id": row[1],
+                "thread_title": row[2],
+                "sender_user_id": row[3],
+                "timestamp": datetime.fromtimestamp(row[4]).isoformat(),
+                "item_type": row[5],
+                "text": row[6],
+                "snippet": row[7],
+                "score": -row[8],
+            }
+            for row in rows
+        ]
+
+    def delete_message(self, account: str, item_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE account = ? AND item_id = ?", (account, str(item_id)))
+            self._db.commit()
+
+    def mark_stale(self, account: str, thread_id: str) -> None:
+        """Forget when the thread's activity was last checked, so the next sync asks Instagram.
+
+        For changes made through this server (a message sent, a thread marked
+        seen) that no inbox listing has reported yet.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE threads SET activity_checked_at = NULL WHERE account = ? AND thread_id = ?",
+                (account, str(thread_id)),
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,244 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds in seconds; the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram in the Prometheus layout."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``q`` quantile (None if empty or beyond the last bound)."""
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum, 6),
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "p99_seconds": self.quantile(0.99),
+        }
+
+
+class UpstreamCall:
+    """HTTP traffic of one upstream ``Client`` call, filled in by the session response hook."""
+
+    __slots__ = ("http_requests", "bytes")
+
+    def __init__(self):
+        self.http_requests = 0
+        self.bytes = 0
+
+    def add_downloads(self, paths: Any) -> None:
+        """Count media files instagrapi fetched with module-level ``requests.get``, which no session hook sees.
+
+        Each file counts as one HTTP request of its size on disk.
+        """
+        for path in paths if isinstance(paths, (list, tuple)) else [paths]:
+            try:
+                size = os.path.getsize(path)
+            except (OSError, TypeError):
+                continue
+            self.http_requests += 1
+            self.bytes += size
+
+
+_current_tool: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("current_tool", default=None)
+_current_call: contextvars.ContextVar[Optional[UpstreamCall]] = contextvars.ContextVar("current_upstream_call", default=None)
+
+
+class Metrics:
+    """In-process counters for tool calls and the Instagram calls they make.
+
+    Tools are wrapped with ``instrument`` (latency, errors by exception type),
+    upstream calls run inside ``upstream_call`` (count, latency, errors) and
+    ``record_response`` is installed as a requests response hook so every HTTP
+    request and its body size is attributed to the upstream call and tool it
+    belongs to. Context variables carry the current tool into worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.tool_latency: Dict[str, Histogram] = {}
+        self.tool_errors: Dict[Tuple[str, str], int] = {}
+        self.upstream_latency: Dict[str, Histogram] = {}
+        self.upstream_errors: Dict[Tuple[str, str], int] = {}
+        # (tool, method) -> [calls, http_requests, bytes]
+        self.upstream_usage: Dict[Tuple[str, str], List[int]] = {}
+        # (tool, method) -> calls answered by another caller's identical in-flight request
+        self.upstream_coalesced: Dict[Tuple[str, str], int] = {}
+
+    def instrument(self, fn: Callable) -> Callable:
+        """Wrap an async tool so each call's latency and outcome are recorded.
+
+        A raised exception counts under its type; a ``{"success": False}``
+        result counts under the type of the last upstream error the call hit,
+        or ``ToolFailure`` if there was none.
+        """
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            state = {"tool": name, "last_error": None}
+            token = _current_tool.set(state)
+            started = time.perf_counter()
+            error = None
+            try:
+                result = await fn(*args, **kwargs)
+                if isinstance(result, dict) and result.get("success") is False:
+                    error = state["last_error"] or "ToolFailure"
+                return result
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                _current_tool.reset(token)
+                self._record_tool(name, time.perf_counter() - started, error)
+
+        return wrapper
+
+    def _record_tool(self, name: str, elapsed: float, error: Optional[str]) -> None:
+        with self._lock:
+            self.tool_latency.setdefault(name, Histogram()).observe(elapsed)
+            if error:
+                self.tool_errors[(name, error)] = self.tool_errors.get((name, error), 0) + 1
+
+    @contextmanager
+    def upstream_call(self, method: str) -> Iterator[UpstreamCall]:
+        """Record one upstream ``Client`` call made by the current tool."""
+        state = _current_tool.get()
+        tool = state["tool"] if state else "-"
+        call = UpstreamCall()
+        token = _current_call.set(call)
+        started = time.perf_counter()
+        error = None
+        try:
+            yield call
+        except BaseException as e:
+            error = type(e).__name__
+            if state:
+                state["last_error"] = error
+            raise
+        finally:
+            _current_call.reset(token)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.upstream_latency.setdefault(method, Histogram()).observe(elapsed)
+                usage = self.upstream_usage.setdefault((tool, method), [0, 0, 0])
+                usage[0] += 1
+                usage[1] += call.http_requests
+                usage[2] += call.bytes
+                if error:
+                    self.upstream_errors[(method, error)] = self.upstream_errors.get((method, error), 0) + 1
+
+    def record_coalesced(self, method: str) -> None:
+        """Count an upstream call the current tool did not make because an identical one was in flight."""
+        state = _current_tool.get()
+        key = (state["tool"] if state else "-", method)
+        with self._lock:
+            self.upstream_coalesced[key] = self.upstream_coalesced.get(key, 0) + 1
+
+    def record_response(self, response, *args, **kwargs) -> None:
+        """requests response hook: count the request and its body against the current upstream call.
+
+        Streamed responses (``stream=True``) are counted by their Content-Length,
+        since reading the body here would consume it before the caller does.
+        """
+        call = _current_call.get()
+        if call is None:
+            return
+        call.http_requests += 1
+        if kwargs.get("stream"):
+            length = response.headers.get("Content-Length", "")
+            call.bytes += int(length) if length.isdigit() else 0
+        else:
+            # Not streamed, so requests reads the body right after the hooks anyway
+            call.bytes += len(response.content or b"")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All metrics as plain data, grouped by tool and by upstream method."""
+        with self._lock:
+            tools: Dict[str, Dict[str, Any]] = {}
+            for name, histogram in self.tool_latency.items():
+                tools[name] = {"latency": histogram.summary(), "errors": {}, "upstream": {}}
+            for (name, error), count in self.tool_errors.items():
+                tools[name]["errors"][error] = count
+            for (tool, method), (calls, http_requests, size) in self.upstream_usage.items():
+                entry = tools.setdefault(tool, {"latency": Histogram().summary(), "errors": {}, "upstream": {}})
+                entry["upstream"][method] = {"calls": calls, "http_requests": http_requests, "bytes": size, "coalesced": 0}
+            for (tool, method), count in self.upstream_coalesced.items():
+                entry = tools.setdefault(tool, {"latency": Histogram().summary(), "errors": {}, "upstream": {}})
+                entry["upstream"].setdefault(method, {"calls": 0, "http_requests": 0, "bytes": 0, "coalesced": 0})["coalesced"] = count
+            upstream = {
+                method: {"latency": histogram.summary(), "errors": {}}
+                for method, histogram in self.upstream_latency.items()
+            }
+            for (method, error), count in self.upstream_errors.items():
+                upstream[method]["errors"][error] = count
+        return {"uptime_seconds": round(time.time() - self.started_at, 1), "tools": tools, "upstream": upstream}
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def histogram(name: str, help_text: str, label: str, histograms: Dict[str, Histogram]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{label}="{_escape(key)}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}="{_escape(key)}"}} {h.sum}')
+                lines.append(f'{name}_count{{{label}="{_escape(key)}"}} {h.count}')
+
+        def counter(name: str, help_text: str, labels: Tuple[str, ...], values: Dict[Tuple[str, ...], int]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                rendered = ",".join(f'{label}="{_escape(v)}"' for label, v in zip(labels, key))
+                lines.append(f"{name}{{{rendered}}} {value}")
+
+        with self._lock:
+            histogram("instagram_mcp_tool_duration_seconds", "Tool call latency.", "tool", self.tool_latency)
+            counter("instagram_mcp_tool_errors_total", "Failed tool calls by error type.", ("tool", "error"), self.tool_errors)
+            histogram("instagram_mcp_upstream_duration_seconds", "Instagram client call latency.", "method", self.upstream_latency)
+            counter("instagram_mcp_upstream_errors_total", "Failed Instagram client calls by exception type.", ("method", "error"), self.upstream_errors)
+            usage = self.upstream_usage
+            counter("instagram_mcp_upstream_calls_total", "Instagram client calls per tool.", ("tool", "method"), {k: v[0] for k, v in usage.items()})
+            counter("instagram_mcp_upstream_http_requests_total", "HTTP requests sent to Instagram per tool.", ("tool", "method"), {k: v[1] for k, v in usage.items()})
+            counter("instagram_mcp_upstream_coalesced_total", "Instagram client calls answered by an identical in-flight call, per tool.", ("tool", "method"), self.upstream_coalesced)
+            counter("instagram_mcp_upstream_response_bytes_total", "Response body bytes received from Instagram per tool.", ("tool", "method"), {k: v[2] for k, v in usage.items()})
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,143 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from download_cache import _file_sha256
+
+
+# Instagram's limits for photos, as instagrapi applies them before uploading
+MAX_SIZE = (1080, 1350)
+MIN_SIZE = (320, 167)
+ASPECT_RATIOS = (4 / 5, 90 / 47)
+
+
+def _fit(size: Tuple[int, int]) -> Tuple[Tuple[int, int, int, int], Tuple[int, int]]:
+    """Centered crop box bringing ``size`` within ``ASPECT_RATIOS`` and the size to scale the crop to."""
+    width, height = size
+    ratio = width / height
+    if ratio > ASPECT_RATIOS[1]:
+        crop_width, crop_height = ASPECT_RATIOS[1] * height, height
+    elif ratio < ASPECT_RATIOS[0]:
+        crop_width, crop_height = width, width / ASPECT_RATIOS[0]
+    else:
+        crop_width, crop_height = width, height
+    box = (
+        int((width - crop_width) / 2), int((height - crop_height) / 2),
+        int((width + crop_width) / 2), int((height + crop_height) / 2),
+    )
+    crop_width, crop_height = box[2] - box[0], box[3] - box[1]
+    scale = min(MAX_SIZE[0] / crop_width, MAX_SIZE[1] / crop_height, 1.0)
+    if scale == 1.0:
+        scale = max(MIN_SIZE[0] / crop_width, MIN_SIZE[1] / crop_height, 1.0)
+    return box, (max(1, int(crop_width * scale)), max(1, int(crop_height * scale)))
+
+
+def prepare_photo(source: str, cache_dir: str, quality: int, max_bytes: int) -> str:
+    """Re-encode a photo for upload and return the path of the result.
+
+    The photo is rotated upright from its EXIF orientation, cropped and
+    scaled to Instagram's aspect ratio and size limits, flattened onto white
+    if it has transparency and saved as a JPEG at ``quality`` without any
+    metadata. Results are cached under ``cache_dir`` by the source's content
+    hash and the quality, so a repeat costs one hash of the file. Runs in a
+    worker process; once the cache grows past ``max_bytes`` the least
+    recently used files are removed.
+    """
+    digest = _file_sha256(Path(source))
+    target = Path(cache_dir) / digest[:2] / f"{digest}-q{quality}.jpg"
+    if target.exists():
+        os.utime(target)
+        return str(target)
+
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            image = image.convert("RGBA")
+            flattened = Image.new("RGB", image.size, "white")
+            flattened.paste(image, mask=image.getchannel("A"))
+            image = flattened
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        box, size = _fit(image.size)
+        image = image.resize(size, Image.LANCZOS, box=box)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        image.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(tmp, target)
+    _prune(Path(cache_dir), max_bytes)
+    return str(target)
+
+
+def _prune(cache_dir: Path, max_bytes: int) -> None:
+    files = []
+    for f in cache_dir.glob("*/*.jpg"):
+        try:
+            stat = f.stat()
+        except FileNotFoundError:  # pruned by another worker
+            continue
+        files.append((stat.st_mtime, stat.st_size, f))
+    total = sum(size for _, size, _ in files)
+    for _, size, f in sorted(files):
+        if total <= max_bytes:
+            break
+        f.unlink(missing_ok=True)
+        total -= size
+
+
+class PhotoPreprocessor:
+    """Shrinks photos before upload on a pool of worker processes.
+
+    Encoding is CPU bound, so it runs outside the server process and never
+    holds up the event loop. The pool starts on first use. Workers are
+    spawned rather than forked because the server has threads running by
+    then, so the main script must be safe to import (``mcp_server`` is).
+    Results already produced for an unchanged file (same path, size and
+    mtime) are reused without asking the pool.
+    """
+
+    def __init__(self, cache_dir: Path, enabled: bool = True, quality: int = 75, max_bytes: int = 256 * 1024 * 1024, workers: int = 2):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._known: Dict[Tuple[str, int, int], str] = {}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def prepare(self, path: str) -> Path:
+        """Path of the upload-ready version of the photo at ``path``."""
+        source = os.path.abspath(path)
+        stat = os.stat(source)
+        key = (source, stat.st_mtime_ns, stat.st_size)
+        known = self._known.get(key)
+        if known and os.path.exists(known):
+            return Path(known)
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._executor(), prepare_photo, source, str(self.cache_dir), self.quality, self.max_bytes,
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed while decoding a huge image); start afresh next time
+            self._pool = None
+            raise
+        if len(self._known) >= 4096:
+            self._known.clear()
+        self._known[key] = result
+        return Path(result)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+
+class ProfileCache:
+    """In-memory LRU of profile lookups with a soft and a hard TTL.
+
+    Entries younger than ``soft_ttl`` are fresh. Older ones are still served
+    but should be refreshed in the background (``needs_refresh``), and entries
+    past ``hard_ttl`` are dropped. At most ``max_entries`` are kept. Used from
+    the event loop only, so no locking.
+    """
+
+    def __init__(self, max_entries: int = 2000, soft_ttl: float = 300, hard_ttl: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return ``(value, age_seconds)``, or None if missing or past the hard TTL."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.hard_ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value, age
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def needs_refresh(self, key: str, age: float) -> bool:
+        """Whether an entry of this age should be refreshed and no refresh is running yet."""
+        return age > self.soft_ttl and key not in self._refreshing
+
+    def refresh_started(self, key: str) -> None:
+        self._refreshing.add(key)
+
+    def refresh_finished(self, key: str) -> None:
+        self._refreshing.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "refreshing": len(self._refreshing)}
@@ -0,0 +1,61 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple, Union
+
+_SEGMENT = re.compile(r"^(\w+)((?:\[-?\d+\])*)$")
+_INDEX = re.compile(r"\[(-?\d+)\]")
+
+
+@lru_cache(maxsize=1024)
+def parse_path(path: str) -> Tuple[Union[str, int], ...]:
+    """Split a field path such as ``messages[-1].text`` into attribute names and indexes."""
+    steps: List[Union[str, int]] = []
+    for segment in path.strip().split("."):
+        match = _SEGMENT.match(segment)
+        if not match:
+            raise ValueError(f"Invalid field path: {path!r}")
+        steps.append(match.group(1))
+        steps.extend(int(i) for i in _INDEX.findall(match.group(2)))
+    return tuple(steps)
+
+
+def _plain(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _resolve(value: Any, steps: Tuple[Union[str, int], ...]) -> Any:
+    for i, step in enumerate(steps):
+        if value is None:
+            return None
+        if isinstance(step, int):
+            try:
+                value = value[step]
+            except (IndexError, KeyError, TypeError):
+                return None
+        elif isinstance(value, (list, tuple)):
+            # An attribute applied to a list maps over its items, e.g. users.username
+            return [_resolve(item, steps[i:]) for item in value]
+        elif isinstance(value, dict):
+            value = value.get(step)
+        else:
+            value = getattr(value, step, None)
+    return value
+
+
+def project(obj: Any, fields: List[str]) -> Dict[str, Any]:
+    """Pick only ``fields`` out of a model, dict or plain object.
+
+    Each field is a dotted path; ``[n]`` indexes a list (negative indexes count
+    from the end) and an attribute applied to a list maps over its items. Only
+    the requested attributes are read, and only the selected values are
+    converted to plain data.
+
+    Returns:
+        A dict keyed by the field paths as given, e.g.
+        ``{"users.username": ["a", "b"], "messages[-1].text": "hi"}``.
+    """
+    return {field: _plain(_resolve(obj, parse_path(field))) for field in fields}
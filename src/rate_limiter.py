@@ -0,0 +1,112 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """Token bucket whose rate is cut on throttling and recovers on success."""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.base_rate = per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.backoff = 0.0
+        self.waiting = 0
+        self.throttled = 0
+        self.lock = asyncio.Lock()
+
+    def reserve(self, now: float) -> float:
+        """Take a token if one is available; otherwise return seconds to wait."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Paces upstream calls with one token bucket per endpoint class.
+
+    Waiters on a class are served in FIFO order. A throttle report (HTTP 429,
+    ``feedback_required``, "please wait a few minutes") halves that class's
+    rate, empties its bucket and pauses it for a backoff period that doubles
+    on consecutive throttles. Each success afterwards restores a tenth of the
+    base rate.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, int]],
+        min_backoff: float = 60.0,
+        max_backoff: float = 1800.0,
+    ):
+        self.buckets = {name: TokenBucket(per_minute, burst) for name, (per_minute, burst) in limits.items()}
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+    async def acquire(self, endpoint_class: str) -> float:
+        """Wait for a token for ``endpoint_class``.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        bucket = self.buckets[endpoint_class]
+        started = time.monotonic()
+        bucket.waiting += 1
+        try:
+            async with bucket.lock:
+                while True:
+                    delay = bucket.reserve(time.monotonic())
+                    if delay <= 0:
+                        return time.monotonic() - started
+                    await asyncio.sleep(delay)
+        finally:
+            bucket.waiting -= 1
+
+    def report_throttled(self, endpoint_class: str, retry_after: Optional[float] = None) -> float:
+        """Back off after Instagram throttled a call; returns the pause in seconds."""
+        bucket = self.buckets[endpoint_class]
+        bucket.throttled += 1
+        bucket.backoff = min(self.max_backoff, max(self.min_backoff, bucket.backoff * 2))
+        pause = max(bucket.backoff, retry_after or 0)
+        bucket.rate = max(bucket.base_rate / 16, bucket.rate / 2)
+        bucket.tokens = 0.0
+        bucket.blocked_until = time.monotonic() + pause
+        return pause
+
+    def report_success(self, endpoint_class: str) -> None:
+        bucket = self.buckets[endpoint_class]
+        if bucket.rate < bucket.base_rate:
+            bucket.rate = min(bucket.base_rate, bucket.rate + bucket.base_rate / 10)
+        elif bucket.backoff:
+            bucket.backoff = 0.0
+
+    def available(self, endpoint_class: str) -> float:
+        """Tokens a new caller could use right now, net of queued callers (negative while paused)."""
+        bucket = self.buckets[endpoint_class]
+        now = time.monotonic()
+        if now < bucket.blocked_until:
+            return -(bucket.blocked_until - now)
+        tokens = min(bucket.capacity, bucket.tokens + (now - bucket.updated) * bucket.rate)
+        return tokens - bucket.waiting
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Current state of every bucket, including how many callers are queued."""
+        now = time.monotonic()
+        return {
+            name: {
+                "queued": bucket.waiting,
+                "tokens": round(min(bucket.capacity, bucket.tokens + (now - bucket.updated) * bucket.rate), 2),
+                "per_minute": round(bucket.rate * 60, 2),
+                "base_per_minute": round(bucket.base_rate * 60, 2),
+                "paused_for_seconds": round(max(0.0, bucket.blocked_until - now), 1),
+                "throttled_total": bucket.throttled,
+            }
+            for name, bucket in self.buckets.items()
+        }
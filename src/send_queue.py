@@ -0,0 +1,245 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+STATUSES = ("queued", "sending", "sent", "failed", "unknown")
+# A queued entry that is next in line for its recipient: nothing older for the
+# same account and username is still queued or being sent
+_NEXT_FOR_RECIPIENT = (
+    "q.status = 'queued' AND NOT EXISTS (SELECT 1 FROM sends o WHERE o.account = q.account AND o.username = q.username"
+    " AND (o.status = 'sending' OR (o.status = 'queued' AND o.id < q.id)))"
+)
+
+
+def _accounts_filter(accounts: Iterable[str]) -> Tuple[str, List[str]]:
+    names = list(accounts)
+    return f"q.account IN ({', '.join('?' * len(names))})", names
+
+
+def _iso(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat(timespec="seconds") if value else None
+
+
+class SendQueue:
+    """Journal of outbound messages in SQLite (WAL), keyed by idempotency key.
+
+    Every entry moves ``queued`` -> ``sending`` -> ``sent`` or ``failed``. An
+    entry is marked ``sending`` (and committed) before its upstream request is
+    made, so an entry found in ``sending`` after a restart may or may not have
+    been delivered; ``recover`` marks those ``unknown`` instead of sending them
+    again. Only entries that are known not to have gone out are ever retried,
+    which makes delivery at-most-once per idempotency key.
+
+    Several server processes may share one journal. Each claims entries in an
+    immediate transaction, only for the accounts it is logged in as, and
+    records itself as the entry's owner. A process keeps a lease alive with
+    ``heartbeat``; ``recover`` only takes over ``sending`` entries whose owner's
+    lease has run out, so it never touches sends another live process is making.
+    """
+
+    def __init__(self, db_path: Path, lease_seconds: float = 60.0):
+        self._lock = threading.Lock()
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit, with explicit transactions where a read must not race other processes
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sends (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                account TEXT NOT NULL,
+                username TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                content TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                error TEXT,
+                direct_message_id TEXT,
+                thread_id TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sends_status ON sends (status, next_attempt_at);
+            CREATE INDEX IF NOT EXISTS sends_recipient ON sends (account, username, status);
+            CREATE TABLE IF NOT EXISTS owners (
+                owner TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(sends)")}
+        if "owner" not in columns:
+            # Journals from before several processes could share them
+            self._db.execute("ALTER TABLE sends ADD COLUMN owner TEXT")
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "send_id": row["id"],
+            "idempotency_key": row["idempotency_key"],
+            "account": row["account"],
+            "username": row["username"],
+            "kind": row["kind"],
+            "content": row["content"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "error": row["error"],
+            "direct_message_id": row["direct_message_id"],
+            "thread_id": row["thread_id"],
+            "created_at": _iso(row["created_at"]),
+            "updated_at": _iso(row["updated_at"]),
+        }
+
+    def enqueue(self, idempotency_key: str, account: str, username: str, kind: str, content: str) -> Tuple[Dict[str, Any], bool]:
+        """Add a send unless one with this idempotency key exists already.
+
+        Returns:
+            ``(entry, created)``; ``created`` is False when the key was already
+            used, in which case the existing entry is returned unchanged.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO sends (idempotency_key, account, username, kind, content, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (idempotency_key) DO NOTHING",
+                (idempotency_key, account, username, kind, content, now, now, now),
+            )
+            row = self._db.execute("SELECT * FROM sends WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        return self._entry(row), cursor.rowcount == 1
+
+    def claim_next(self, accounts: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Mark the next due entry from one of ``accounts`` ``sending`` and return it (None if nothing is due).
+
+        Sends to one recipient from one account go out in the order they were
+        queued: an entry is only due once no earlier entry for the same
+        recipient is still queued or being sent.
+        """
+        in_accounts, names = _accounts_filter(accounts)
+        if not names:
+            return None
+        now = time.time()
+        with self._lock:
+            # Held from the read to the write, so no other process claims the same entry
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    f"SELECT id FROM sends q WHERE {_NEXT_FOR_RECIPIENT} AND {in_accounts} AND q.next_attempt_at <= ?"
+                    " ORDER BY q.id LIMIT 1",
+                    (*names, now),
+                ).fetchone()
+                claimed = row is not None and self._db.execute(
+                    "UPDATE sends SET status = 'sending', owner = ?, attempts = attempts + 1, updated_at = ?"
+                    " WHERE id = ? AND status = 'queued'",
+                    (self.owner, now, row["id"]),
+                ).rowcount == 1
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if not claimed:
+                return None
+            row = self._db.execute("SELECT * FROM sends WHERE id = ?", (row["id"],)).fetchone()
+        return self._entry(row)
+
+    def next_due_in(self, accounts: Iterable[str]) -> Optional[float]:
+        """Seconds until ``claim_next(accounts)`` can return an entry, or None if that needs a send to finish first.
+
+        None also covers an empty queue.
+        """
+        in_accounts, names = _accounts_filter(accounts)
+        if not names:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT MIN(q.next_attempt_at) FROM sends q WHERE {_NEXT_FOR_RECIPIENT} AND {in_accounts}", names
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _finish(self, send_id: int, status: str, error: Optional[str] = None, **fields: Any) -> None:
+        assignments = "".join(f", {name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE sends SET status = ?, error = ?, updated_at = ?{assignments} WHERE id = ?",
+                (status, error, time.time(), *fields.values(), send_id),
+            )
+
+    def mark_sent(self, send_id: int, direct_message_id: Optional[str], thread_id: Optional[str]) -> None:
+        self._finish(send_id, "sent", direct_message_id=direct_message_id, thread_id=thread_id)
+
+    def mark_failed(self, send_id: int, error: str) -> None:
+        """The send was not delivered and will not be retried."""
+        self._finish(send_id, "failed", error)
+
+    def mark_unknown(self, send_id: int, error: str) -> None:
+        """The send may or may not have been delivered; it is not retried."""
+        self._finish(send_id, "unknown", error)
+
+    def retry_later(self, send_id: int, delay: float, error: str) -> None:
+        """The send was not delivered; queue it again in ``delay`` seconds."""
+        self._finish(send_id, "queued", error, next_attempt_at=time.time() + delay)
+
+    def heartbeat(self) -> None:
+        """Extend this process's lease on the entries it is sending by ``lease_seconds``."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO owners (owner, expires_at) VALUES (?, ?)"
+                " ON CONFLICT (owner) DO UPDATE SET expires_at = excluded.expires_at",
+                (self.owner, time.time() + self.lease_seconds),
+            )
+
+    def recover(self) -> int:
+        """Mark entries left ``sending`` by a process that stopped as ``unknown``; returns how many.
+
+        A process counts as stopped once its lease has expired (or it never
+        had one); entries of processes still renewing their lease are left alone.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE sends SET status = 'unknown', error = 'Server stopped while sending', updated_at = ?"
+                " WHERE status = 'sending' AND (owner IS NULL OR owner NOT IN (SELECT owner FROM owners WHERE expires_at > ?))",
+                (now, now),
+            )
+            self._db.execute("DELETE FROM owners WHERE expires_at <= ?", (now,))
+        return cursor.rowcount
+
+    def get(self, send_id: Optional[int] = None, idempotency_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if send_id is not None:
+                row = self._db.execute("SELECT * FROM sends WHERE id = ?", (send_id,)).fetchone()
+            else:
+                row = self._db.execute("SELECT * FROM sends WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def recent(self, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Newest entries first, optionally only those with ``status``."""
+        with self._lock:
+            if status:
+                rows = self._db.execute("SELECT * FROM sends WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)).fetchall()
+            else:
+                rows = self._db.execute("SELECT * FROM sends ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM sends GROUP BY status").fetchall()
+        counts = {status: 0 for status in STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def close(self) -> None:
+        """Give up this process's lease, so others can recover its unfinished sends at once, and close."""
+        with self._lock:
+            self._db.execute("DELETE FROM owners WHERE owner = ?", (self.owner,))
+            self._db.close()
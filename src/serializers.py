@@ -0,0 +1,189 @@
+import re
+from typing import Any, Callable, Dict, Optional
+
+_POST_CODE = re.compile(r"instagram\.com/(?:p|reel|reels|tv)/([\w-]+)")
+# Optional DirectMessage fields an unknown item type may carry
+_EXTRA_FIELDS = (
+    "link", "animated_media", "media", "visual_media", "media_share", "reel_share",
+    "story_share", "felix_share", "xma_share", "clip", "placeholder",
+)
+
+
+def _str(value: Any) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def _direct_media(media) -> Dict[str, Any]:
+    return {
+        "id": media.id,
+        "media_type": media.media_type,
+        "thumbnail_url": _str(media.thumbnail_url),
+        "video_url": _str(media.video_url),
+        "audio_url": _str(media.audio_url),
+    }
+
+
+def _post(media) -> Dict[str, Any]:
+    """The parts of a shared post or reel an agent needs to describe or download it."""
+    user = media.user
+    return {
+        "pk": media.pk,
+        "code": media.code,
+        "media_type": media.media_type,
+        "product_type": media.product_type or None,
+        "caption_text": media.caption_text or None,
+        "thumbnail_url": _str(media.thumbnail_url),
+        "video_url": _str(media.video_url),
+        "username": user.username if user is not None else None,
+    }
+
+
+def _post_url(media) -> Optional[str]:
+    if not media.code:
+        return None
+    kind = "reel" if media.product_type == "clips" else "p"
+    return f"https://www.instagram.com/{kind}/{media.code}/"
+
+
+def _shared(record: Dict[str, Any], info: Optional[Dict[str, Any]], url: Optional[str], code: Optional[str]) -> None:
+    record["shared_post_info"] = info
+    record["shared_post_url"] = url
+    record["shared_post_code"] = code
+
+
+def _plain(value: Any) -> Any:
+    return value.model_dump() if hasattr(value, "model_dump") else value
+
+
+# -- one extractor per item_type ------------------------------------------------
+
+def _text(message, record: Dict[str, Any]) -> None:
+    pass
+
+
+def _media(message, record: Dict[str, Any]) -> None:
+    if message.media is not None:
+        record["media"] = _direct_media(message.media)
+
+
+def _media_share(message, record: Dict[str, Any]) -> None:
+    post = message.media_share or message.clip
+    if post is not None:
+        _shared(record, _post(post), _post_url(post), post.code)
+
+
+def _clip(message, record: Dict[str, Any]) -> None:
+    post = message.clip or message.media_share
+    if post is not None:
+        url = f"https://www.instagram.com/reel/{post.code}/" if post.code else None
+        _shared(record, _post(post), url, post.code)
+
+
+def _xma_share(message, record: Dict[str, Any]) -> None:
+    xma = message.xma_share
+    if xma is None:
+        _clip(message, record)
+        return
+    url = _str(xma.video_url)
+    match = _POST_CODE.search(url or "")
+    info = {
+        "url": url,
+        "title": xma.title or None,
+        "preview_url": _str(xma.preview_url),
+        "header_title_text": xma.header_title_text or None,
+    }
+    _shared(record, info, url, match.group(1) if match else None)
+
+
+def _field(name: str) -> Callable[[Any, Dict[str, Any]], None]:
+    def extract(message, record: Dict[str, Any]) -> None:
+        value = getattr(message, name)
+        if value is not None:
+            record[name] = value
+    return extract
+
+
+def _link(message, record: Dict[str, Any]) -> None:
+    if message.link is not None:
+        record["link"] = message.link
+
+
+def _everything(message, record: Dict[str, Any]) -> None:
+    """Fallback for item types without an extractor: keep every non-empty optional field."""
+    for name in _EXTRA_FIELDS:
+        value = getattr(message, name)
+        if value is not None:
+            record[name] = _plain(value)
+
+
+MESSAGE_EXTRACTORS: Dict[Optional[str], Callable[[Any, Dict[str, Any]], None]] = {
+    "text": _text,
+    "like": _text,
+    "action_log": _text,
+    "media": _media,
+    "raw_media": _media,
+    "voice_media": _media,
+    "media_share": _media_share,
+    "clip": _clip,
+    "xma_media_share": _xma_share,
+    "xma_clip": _xma_share,
+    "xma_reel_share": _xma_share,
+    "link": _link,
+    "animated_media": _field("animated_media"),
+    "visual_media": _field("visual_media"),
+    "reel_share": _field("reel_share"),
+    "story_share": _field("story_share"),
+    "felix_share": _field("felix_share"),
+    "placeholder": _field("placeholder"),
+}
+
+
+def serialize_message(message) -> Dict[str, Any]:
+    """A ``DirectMessage`` as the dict ``list_messages`` returns.
+
+    Reads only the attributes the tools return instead of ``model_dump``-ing
+    the message, whose shared posts and reels carry whole nested ``Media``
+    models, then runs the extractor for its ``item_type``. Values stay
+    datetimes, strings and numbers for FastMCP's ``pydantic_core.to_json``.
+
+    Every message has its id, sender, thread, timestamp, item type, text and
+    the ``shared_post_*`` fields (None unless it shares a post or reel); the
+    rest depends on the item type.
+    """
+    record = {
+        "id": message.id,
+        "user_id": message.user_id,
+        "thread_id": _str(message.thread_id),
+        "timestamp": message.timestamp,
+        "item_type": message.item_type,
+        "is_sent_by_viewer": message.is_sent_by_viewer,
+        "text": message.text,
+        "shared_post_info": None,
+        "shared_post_url": None,
+        "shared_post_code": None,
+    }
+    if message.reactions:
+        record["reactions"] = message.reactions
+    if message.reply is not None:
+        reply = message.reply
+        record["reply"] = {"id": reply.id, "user_id": reply.user_id, "item_type": reply.item_type, "text": reply.text}
+    MESSAGE_EXTRACTORS.get(message.item_type, _everything)(message, record)
+    return record
+
+
+def serialize_thread(thread) -> Dict[str, Any]:
+    """A whole ``DirectThread``, its messages serialized like ``list_messages`` does."""
+    record = thread.model_dump(exclude={"messages"})
+    record["messages"] = [serialize_message(m) for m in thread.messages]
+    return record
+
+
+def thread_summary(thread) -> Dict[str, Any]:
+    """The short form of a thread ``list_chats`` returns by default."""
+    return {
+        "thread_id": thread.id,
+        "thread_title": thread.thread_title,
+        "users": [{"username": u.username, "full_name": u.full_name, "pk": u.pk} for u in thread.users],
+        "last_activity_at": thread.last_activity_at,
+        "last_message": serialize_message(thread.messages[-1]) if thread.messages else None,
+    }
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from typing import Any, FrozenSet, Iterable, Optional, Tuple
+
+from message_store import _epoch
+
+
+def _participants_key(user_ids: Iterable[Any]) -> FrozenSet[str]:
+    return frozenset(str(pk) for pk in user_ids)
+
+
+class ThreadCache:
+    """In-memory LRU of assembled threads, valid for one ``last_activity_at``.
+
+    A thread is stored together with the activity timestamp it is current up
+    to and served only while that is still the thread's activity, so any newer
+    message makes the entry unusable. Inbox listings (``note_threads``) drop
+    entries whose activity moved on and record which thread each set of
+    participants talks in, so a thread can be found by its members without
+    asking Instagram. Entries are kept per account (by username), like the
+    message store. Used from the event loop only, so no locking.
+    """
+
+    def __init__(self, max_entries: int = 200):
+        self.max_entries = max_entries
+        self._threads: "OrderedDict[Tuple[str, str], Tuple[Optional[float], Any, bool]]" = OrderedDict()
+        self._participants: "OrderedDict[Tuple[str, FrozenSet[str]], str]" = OrderedDict()
+
+    def get(self, account: str, thread_id: str, last_activity_at: Any, amount: int) -> Optional[Any]:
+        """The cached thread with its ``amount`` newest messages, or None.
+
+        None unless an entry exists for exactly this activity timestamp and
+        holds at least ``amount`` messages (or the whole conversation).
+        """
+        key = (account, str(thread_id))
+        entry = self._threads.get(key)
+        if entry is None:
+            return None
+        activity, thread, complete = entry
+        if activity is None or activity != _epoch(last_activity_at):
+            del self._threads[key]
+            return None
+        if len(thread.messages) < amount and not complete:
+            return None
+        self._threads.move_to_end(key)
+        if len(thread.messages) > amount:
+            return thread.model_copy(update={"messages": thread.messages[:amount]})
+        return thread
+
+    def set(self, account: str, thread: Any, last_activity_at: Any, complete: bool = False) -> None:
+        """Cache ``thread`` as ``account`` sees it, current up to ``last_activity_at``.
+
+        Args:
+            complete: True when ``thread.messages`` is the whole conversation.
+        """
+        key = (account, str(thread.id))
+        entry = self._threads.get(key)
+        activity = _epoch(last_activity_at)
+        # Keep a longer copy of the same state rather than replace it with a shorter one
+        if entry is not None and entry[0] == activity and len(entry[1].messages) > len(thread.messages):
+            self._threads.move_to_end(key)
+            return
+        self._threads[key] = (activity, thread, complete)
+        self._threads.move_to_end(key)
+        while len(self._threads) > self.max_entries:
+            self._threads.popitem(last=False)
+
+    def invalidate(self, account: str, thread_id: str) -> None:
+        self._threads.pop((account, str(thread_id)), None)
+
+    def note_threads(self, account: str, threads: Iterable[Any]) -> None:
+        """Take in an inbox listing: drop entries it shows to be outdated and index the participants."""
+        for thread in threads:
+            key = (account, str(thread.id))
+            entry = self._threads.get(key)
+            if entry is not None and entry[0] != _epoch(thread.last_activity_at):
+                del self._threads[key]
+            self.remember_participants(account, thread)
+
+    def remember_participants(self, account: str, thread: Any) -> None:
+        key = (account, _participants_key(u.pk for u in thread.users))
+        self._participants[key] = str(thread.id)
+        self._participants.move_to_end(key)
+        while len(self._participants) > 10 * self.max_entries:
+            self._participants.popitem(last=False)
+
+    def thread_for(self, account: str, user_ids: Iterable[Any]) -> Optional[str]:
+        """Id of the thread ``account`` has with exactly these other participants, if known."""
+        return self._participants.get((account, _participants_key(user_ids)))
@@ -0,0 +1,147 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable, Optional, Tuple
+
+
+class UserIdCache:
+    """Username -> user ID cache with an in-memory LRU in front of a SQLite table.
+
+    Entries expire after ``ttl`` seconds. Usernames that Instagram reported as
+    unknown are stored as negative entries (user_id ``None``) that expire after
+    the shorter ``negative_ttl``.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        max_memory_entries: int = 5000,
+        ttl: float = 7 * 24 * 3600,
+        negative_ttl: float = 3600,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " username TEXT PRIMARY KEY,"
+            " user_id TEXT,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS users_user_id ON users (user_id)")
+        self._db.commit()
+
+    @staticmethod
+    def _key(username: str) -> str:
+        return str(username).strip().lstrip("@").lower()
+
+    def _remember_in_memory(self, key: str, user_id: Optional[str], expires_at: float) -> None:
+        self._memory[key] = (user_id, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_cached(self, username: str) -> Tuple[bool, Optional[str]]:
+        """Look up a username in memory only, never touching the database; like ``get`` otherwise."""
+        key = self._key(username)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None or entry[1] <= time.time():
+                return False, None
+            self._memory.move_to_end(key)
+            return True, entry[0]
+
+    def get(self, username: str) -> Tuple[bool, Optional[str]]:
+        """Look up a username.
+
+        Returns:
+            A ``(found, user_id)`` tuple. ``found`` is False on a miss; a found
+            entry with ``user_id`` None is a cached "user not found".
+        """
+        key = self._key(username)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    return True, entry[0]
+                del self._memory[key]
+            row = self._db.execute(
+                "SELECT user_id, expires_at FROM users WHERE username = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                return False, None
+            self._remember_in_memory(key, row[0], row[1])
+            return True, row[0]
+
+    def get_username(self, user_id: Any) -> Optional[str]:
+        """Reverse lookup of a cached, unexpired username for a user ID."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT username FROM users WHERE user_id = ? AND expires_at > ?"
+                " ORDER BY expires_at DESC LIMIT 1",
+                (str(user_id), time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, username: str, user_id: Any) -> None:
+        """Cache a resolved username."""
+        self.set_many([(username, user_id)])
+
+    def set_missing(self, username: str) -> None:
+        """Cache that a username does not exist."""
+        key = self._key(username)
+        expires_at = time.time() + self.negative_ttl
+        with self._lock:
+            self._remember_in_memory(key, None, expires_at)
+            self._db.execute(
+                "INSERT OR REPLACE INTO users (username, user_id, expires_at) VALUES (?, NULL, ?)",
+                (key, expires_at),
+            )
+            self._db.commit()
+
+    def set_many(self, pairs: Iterable[Tuple[str, Any]]) -> int:
+        """Cache several ``(username, user_id)`` pairs in one transaction."""
+        expires_at = time.time() + self.ttl
+        rows = [
+            (self._key(username), str(user_id), expires_at)
+            for username, user_id in pairs
+            if username and user_id
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            for key, user_id, _ in rows:
+                self._remember_in_memory(key, user_id, expires_at)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO users (username, user_id, expires_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+        return len(rows)
+
+    def remember(self, users: Iterable[Any]) -> int:
+        """Cache the username/pk pairs carried by user objects or dicts.
+
+        Accepts anything with ``username`` and ``pk`` attributes or keys, such as
+        instagrapi ``UserShort``/``User`` models or their ``dict()`` dumps.
+        """
+        pairs = []
+        for user in users or []:
+            if isinstance(user, dict):
+                pairs.append((user.get("username"), user.get("pk") or user.get("user_id")))
+            else:
+                pairs.append((getattr(user, "username", None), getattr(user, "pk", None)))
+        return self.set_many(pairs)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
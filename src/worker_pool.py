@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Union
+
+
+class ClientWorkerPool:
+    """Runs blocking instagrapi calls on a bounded thread pool.
+
+    instagrapi keeps per-request state (``last_response``, ``last_json``) on the
+    Client instance, so one Client must never serve two requests at once. Each
+    worker thread therefore gets its own Client cloned from the primary client's
+    session settings. The primary client itself is only read or mutated while
+    holding ``lock``; call ``invalidate()`` after changing its session (e.g. a
+    login) so workers pick up the new settings.
+
+    ``response_hook``, if given, is installed on the HTTP sessions of every
+    worker client. Calls run in a copy of the caller's context, so the hook
+    can see the caller's context variables.
+    """
+
+    def __init__(self, client, max_workers: int = 4, response_hook: Optional[Callable] = None):
+        self.client = client
+        self.max_workers = max_workers
+        self.response_hook = response_hook
+        self.lock = threading.RLock()
+        self._generation = 0
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self.lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="instagrapi"
+                    )
+        return self._executor
+
+    @property
+    def generation(self) -> int:
+        """Bumped by every ``invalidate()``; tells whether the session changed since it was read."""
+        return self._generation
+
+    def invalidate(self) -> None:
+        """Make every worker re-clone the primary client on its next call."""
+        with self.lock:
+            self._generation += 1
+
+    def _worker_client(self):
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            with self.lock:
+                settings = self.client.get_settings()
+                generation = self._generation
+                proxy = self.client.proxy
+                delay_range = self.client.delay_range
+            local.client = type(self.client)(settings=settings, proxy=proxy, delay_range=delay_range)
+            if self.response_hook is not None:
+                for session in (local.client.private, local.client.public):
+                    session.hooks["response"].append(self.response_hook)
+            local.generation = generation
+        return local.client
+
+    def run_sync(self, method: Union[str, Callable], *args, **kwargs) -> Any:
+        """Call ``method`` on this thread's Client.
+
+        ``method`` is either a Client method name or a function that takes the
+        Client as its first argument.
+        """
+        worker = self._worker_client()
+        if isinstance(method, str):
+            return getattr(worker, method)(*args, **kwargs)
+        return method(worker, *args, **kwargs)
+
+    async def call(self, method: Union[str, Callable], *args, **kwargs) -> Any:
+        """Await ``run_sync`` on the worker pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(context.run, self.run_sync, method, *args, **kwargs)
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self.lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)